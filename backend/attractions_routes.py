@@ -1,5 +1,6 @@
-from fastapi import APIRouter, HTTPException, Query, Depends
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Query, Depends, Path, Request
+from fastapi.responses import Response
+from typing import List, Optional, Union
 from models import (
     Attraction, 
     AttractionCreate, 
@@ -7,35 +8,209 @@ from models import (
     AttractionFilter,
     UserFavorite,
     UserFavoriteCreate,
-    AttractionStats
+    AttractionStats,
+    NearbyAttraction,
+    AttractionCard,
+    NearbyAttractionCard,
+    AttractionChanges,
+    AttractionBatch,
+    AttractionBatchQuery,
+    FacetedAttractions,
+    BulkImportReport,
+    RouteAttraction,
+    RouteCorridorQuery,
+    SearchHit,
+    Suggestion
 )
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from database import get_database
+from cache import (
+    PRIVATE_CACHE_CONTROL,
+    PUBLIC_CACHE_CONTROL,
+    attraction_cache,
+    cache_key,
+    etag_for,
+    etag_matches,
+    matching_etag,
+    read_flights
+)
+from stats import load_stats, record_change, stats_from_documents, STATS_FIELDS
+from catalog import READ_MODE, apply_write, catalog_version, get_catalog, get_suggest_index, publish_write, warm_catalog
+from pagination import (
+    InvalidCursor,
+    cursor_offset,
+    keyset_cursor,
+    keyset_filter,
+    offset_cursor,
+    sort_spec
+)
+from facets import InvalidFacets, count_in_memory, facet_counts, facet_stages, matches_filter, matches_owned, owned_filters, parse_facets
+from normalization import normalized_fields, range_filter
+from projection import InvalidFields, mongo_projection, resolve_fields
+from serialization import ATTRACTION_FIELDS, JSON, MSGPACK, JSONResponse, encode, negotiate, to_response
+from sync import load_changes, sync_horizon
+from bundle import bundle_store
+from bulk import bulk_upsert
+from geo import GEO_MODE, corridor_match, decode_polyline, to_geojson_point
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, OperationFailure
 from datetime import datetime
-import re
+from itertools import islice
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/attractions", tags=["attractions"])
 
-# Get database connection
-def get_database():
-    mongo_url = os.environ['MONGO_URL']
-    client = AsyncIOMotorClient(mongo_url)
-    db = client[os.environ['DB_NAME']]
-    return db
+async def cached_response(request, key, load, with_headers=False, store=True, cache_control=PUBLIC_CACHE_CONTROL):
+    """Serve ``key`` from the attraction cache, calling ``load()`` on a miss.
+
+    The ETag comes from the catalog version and ``key`` (see
+    ResponseCache.validator), so a client holding the current body gets its
+    304 before the cache, MongoDB or the snapshot are consulted, even once
+    the entry expired or on a worker that never built it.
+
+    Hits return the stored bytes directly: no Mongo round trip and no
+    Pydantic validation or serialization. With ``with_headers``, ``load()``
+    returns ``(payload, headers)`` and the headers are cached with the body.
+    JSON and MessagePack bodies are cached separately. Without ``store``
+    the body is built for this request only (keys that rarely repeat).
+    Concurrent misses of the same key share one ``load()`` (see SingleFlight).
+    """
+    media_type = negotiate(request.headers.get("accept"))
+    if media_type == MSGPACK:
+        key = (key, MSGPACK)
+    version = catalog_version()
+    etag = attraction_cache.validator(key, version)
+    matched = matching_etag(request.headers.get("if-none-match"), etag)
+    if matched:
+        return not_modified(matched, cache_control)
+
+    entry = attraction_cache.get(key) if store else None
+    if entry is None or entry.headers["ETag"] != etag:
+        async def fill():
+            if with_headers:
+                payload, headers = await load()
+            else:
+                payload, headers = await load(), None
+            # Not stored if a write landed while loading
+            return attraction_cache.set(
+                key, encode(payload, media_type), headers, version=version, etag=etag, store=store,
+            )
+
+        # The tag keeps requests made after a write out of an older flight
+        entry = await read_flights.run((key, etag), fill)
+    return conditional_response(request, entry.body, entry.headers, cache_control, media_type)
+
+def not_modified(etag, cache_control=PUBLIC_CACHE_CONTROL):
+    """304 for a client whose copy, tagged ``etag``, is current"""
+    return Response(status_code=304, headers={
+        # The tag the client holds, which the compression middleware may have
+        # suffixed with the encoding; 304s are not compressed
+        "ETag": etag,
+        "Cache-Control": cache_control,
+        "X-Catalog-Version": str(attraction_cache.version),
+        "Vary": "Accept",
+    })
+
+def respond(request, payload, cache_control=PUBLIC_CACHE_CONTROL):
+    """Uncached read response in the format the client asked for"""
+    media_type = negotiate(request.headers.get("accept"))
+    return conditional_response(request, encode(payload, media_type), cache_control=cache_control, media_type=media_type)
+
+def conditional_response(request, body, headers=None, cache_control=PUBLIC_CACHE_CONTROL, media_type=JSON):
+    """Response with ETag and caching headers, or 304 when the client's copy is current"""
+    headers = {
+        **(headers or {}),
+        "Cache-Control": cache_control,
+        "X-Catalog-Version": str(attraction_cache.version),
+        # Body format follows the Accept header (JSON or MessagePack)
+        "Vary": "Accept",
+    }
+    headers.setdefault("ETag", etag_for(body))
+    matched = matching_etag(request.headers.get("if-none-match"), headers["ETag"])
+    if matched:
+        return not_modified(matched, cache_control)
+    return Response(content=body, media_type=media_type, headers=headers)
+
+async def catalog_changed(db, before, after):
+    """Propagate an attraction write to the derived read structures"""
+    version = await publish_write(db)
+    apply_write(before, after, version)
+    await record_change(db, before, after)
+
+FIELDS_DESCRIPTION = "Comma separated fields to return, overrides view (id is always included)"
 
-@router.get("/", response_model=List[Attraction])
+@router.get("/", response_model=Union[List[Attraction], List[AttractionCard], FacetedAttractions])
 async def get_attractions(
+    request: Request,
     category: Optional[str] = Query(None, description="Filter by category"),
     difficulty: Optional[str] = Query(None, description="Filter by difficulty"),
     rating_min: Optional[float] = Query(None, ge=0, le=5, description="Minimum rating"),
     rating_max: Optional[float] = Query(None, ge=0, le=5, description="Maximum rating"),
-    search: Optional[str] = Query(None, description="Search in name and description"),
+    price_max: Optional[float] = Query(None, ge=0, description="Maximum price in reais"),
+    duration_max: Optional[int] = Query(None, ge=0, description="Maximum duration in minutes"),
+    distance_max: Optional[float] = Query(None, ge=0, description="Maximum distance from Bonito in km"),
+    search: Optional[str] = Query(None, max_length=200, description="Full-text search (accent-insensitive, ranked)"),
+    sort: str = Query("rating", pattern="^(rating|name|price)$", description="Sort order, ignored when searching"),
+    cursor: Optional[str] = Query(None, max_length=512, description="X-Next-Cursor of the previous page"),
+    include_total: bool = Query(False, description="Return the number of matches in X-Total-Count"),
+    view: Optional[str] = Query(None, pattern="^(card|detail)$", description="card: list card fields only"),
+    fields: Optional[str] = Query(None, max_length=300, description=FIELDS_DESCRIPTION),
+    facets: Optional[str] = Query(None, max_length=100, description="Comma separated facets to count (category, difficulty, price_bucket)"),
     limit: int = Query(50, ge=1, le=100, description="Number of results"),
-    skip: int = Query(0, ge=0, description="Number of results to skip"),
+    skip: int = Query(0, ge=0, description="Number of results to skip, prefer cursor", deprecated=True),
+    db: AsyncIOMotorDatabase = Depends(get_database),
 ):
-    """Get all attractions with optional filtering"""
-    db = get_database()
-    
+    """Get all attractions with optional filtering.
+
+    Pages follow a stable order (``sort``, then id). Pass the X-Next-Cursor
+    header of a response as ``cursor`` to fetch the next page; the header is
+    absent on the last page.
+    
+    With ``facets`` the response is ``{"attractions": [...], "facets": {...}}``,
+    the page plus the counts of each facet value under the other filters.
+    """
+    # Surrounding whitespace does not change the result, keep it out of the key
+    search = search.strip() or None if search else None
+    selected = selected_fields(view, fields)
+    try:
+        requested_facets = parse_facets(facets) if facets else None
+    except InvalidFacets as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    ranges = range_filter(price_max, duration_max, distance_max)
+    
+    key = cache_key(
+        "list",
+        category=category,
+        difficulty=difficulty,
+        rating_min=rating_min,
+        rating_max=rating_max,
+        price_max=price_max,
+        duration_max=duration_max,
+        distance_max=distance_max,
+        search=search,
+        sort=sort,
+        cursor=cursor,
+        include_total=include_total,
+        fields=selected,
+        facets=requested_facets,
+        limit=limit,
+        skip=skip,
+    )
+    try:
+        return await cached_response(request, key, lambda: find_attractions(
+            db, category, difficulty, rating_min, rating_max, ranges, search, sort, cursor, include_total, selected, requested_facets, limit, skip
+        ), with_headers=True)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def find_attractions(db, category, difficulty, rating_min, rating_max, ranges, search, sort, cursor, include_total, fields, facets, limit, skip):
+    """Query one page of attractions matching the listing filters.
+
+    Returns the page and its pagination headers. With ``facets`` the page is
+    wrapped as ``{"attractions": [...], "facets": {...}}``.
+    """
     # Build filter query
     filter_query = {"is_active": True}
     
@@ -51,237 +226,476 @@ async def get_attractions(
     if rating_max is not None:
         filter_query.setdefault("rating", {})["$lte"] = rating_max
     
+    # price_max, duration_max and distance_max on the normalized numbers
+    filter_query.update(ranges)
+    
     if search:
-        # Case-insensitive search in name and description
-        regex = re.compile(search, re.IGNORECASE)
-        filter_query["$or"] = [
-            {"name": {"$regex": regex}},
-            {"description": {"$regex": regex}},
-            {"full_description": {"$regex": regex}}
-        ]
-    
-    # Execute query
-    cursor = db.attractions.find(filter_query).skip(skip).limit(limit)
-    attractions = await cursor.to_list(length=limit)
-    
-    # Convert field names for Pydantic compatibility
-    for attraction in attractions:
-        if 'full_description' in attraction:
-            attraction['fullDescription'] = attraction.pop('full_description')
+        # Ranked full-text search runs on the in-memory catalog index
+        return await search_catalog(db, search, filter_query, cursor, include_total, fields, facets, limit, skip)
+    if READ_MODE == "snapshot":
+        return snapshot_page(await get_catalog(db), filter_query, sort, cursor, include_total, fields, facets, limit, skip)
+    if facets:
+        return await facet_page(db, filter_query, sort, cursor, include_total, fields, facets, limit, skip)
+    
+    # Keyset pagination: deep pages seek in the index like the first one
+    page_query = filter_query
+    if cursor:
+        page_query = {**filter_query, **keyset_filter(sort, cursor)}
+    
+    # Execute query, one extra document tells whether another page exists.
+    # A sparse fieldset still reads the sort key, the next cursor needs it.
+    projection = mongo_projection(fields, extra=(sort_spec(sort)[0][0],)) if fields else None
+    query = db.attractions.find(page_query, projection).sort(sort_spec(sort))
+    if skip and not cursor:
+        query = query.skip(skip)
+    attractions = await query.limit(limit + 1).to_list(length=limit + 1)
+    
+    headers = {}
+    if len(attractions) > limit:
+        attractions = attractions[:limit]
+        headers["X-Next-Cursor"] = keyset_cursor(sort, attractions[-1])
+    if include_total:
+        headers["X-Total-Count"] = str(await db.attractions.count_documents(filter_query))
+    
+    return response_attractions(attractions, fields), headers
+
+async def facet_page(db, filter_query, sort, cursor, include_total, fields, facets, limit, skip):
+    """A listing page and its facet counts from a single $facet aggregation"""
+    common, owned = owned_filters(filter_query, facets)
+    selected = {field: condition for conditions in owned.values() for field, condition in conditions.items()}
+    
+    page_query = {**selected, **keyset_filter(sort, cursor)} if cursor else selected
+    page = ([{"$match": page_query}] if page_query else []) + [{"$sort": dict(sort_spec(sort))}]
+    if skip and not cursor:
+        page.append({"$skip": skip})
+    page.append({"$limit": limit + 1})
+    page.append({"$project": mongo_projection(fields, extra=(sort_spec(sort)[0][0],)) if fields else {"_id": 0, "location": 0}})
+    
+    stages = {"page": page, **facet_stages(owned)}
+    if include_total:
+        stages["total"] = ([{"$match": selected}] if selected else []) + [{"$count": "count"}]
+    
+    result = await db.attractions.aggregate([{"$match": common}, {"$facet": stages}]).to_list(1)
+    result = result[0] if result else {}
+    attractions = result.get("page", [])
+    
+    headers = {}
+    if len(attractions) > limit:
+        attractions = attractions[:limit]
+        headers["X-Next-Cursor"] = keyset_cursor(sort, attractions[-1])
+    if include_total:
+        total = result.get("total")
+        headers["X-Total-Count"] = str(total[0]["count"] if total else 0)
+    
+    counts = {name: facet_counts(name, result.get(name, [])) for name in facets}
+    return {"attractions": response_attractions(attractions, fields), "facets": counts}, headers
+
+def snapshot_page(catalog, filter_query, sort, cursor, include_total, fields, facets, limit, skip):
+    """A listing page, and its facet counts, served from the catalog snapshot"""
+    start = skip if skip and not cursor else 0
+    attractions = list(islice(catalog.select(filter_query, sort, cursor), start, start + limit + 1))
+    
+    headers = {}
+    if len(attractions) > limit:
+        attractions = attractions[:limit]
+        headers["X-Next-Cursor"] = keyset_cursor(sort, attractions[-1])
+    if include_total:
+        headers["X-Total-Count"] = str(sum(1 for _ in catalog.select(filter_query)))
+    
+    if facets:
+        common, owned = owned_filters(filter_query, facets)
+        counts = count_in_memory(list(catalog.select(common)), owned)
+        return {"attractions": response_attractions(attractions, fields), "facets": counts}, headers
+    return response_attractions(attractions, fields), headers
+
+async def search_catalog(db, search, filter_query, cursor, include_total, fields, facets, limit, skip):
+    """Listing filters applied to full-text matches, in relevance order"""
+    catalog = await get_catalog(db)
+    common, owned = owned_filters(filter_query, facets or ())
+    candidates = []
+    for position, _ in catalog.search_index.search(search):
+        attraction = catalog.documents[position]
+        if matches_filter(attraction, common):
+            candidates.append(attraction)
+    matches = [attraction for attraction in candidates if matches_owned(attraction, owned)] if owned else candidates
+    
+    # Matches are ranked in memory, so the cursor is just an offset into them
+    start = cursor_offset("relevance", cursor) if cursor else skip
+    headers = {}
+    if start + limit < len(matches):
+        headers["X-Next-Cursor"] = offset_cursor("relevance", start + limit)
+    if include_total:
+        headers["X-Total-Count"] = str(len(matches))
+    
+    attractions = response_attractions(matches[start:start + limit], fields)
+    if facets:
+        return {"attractions": attractions, "facets": count_in_memory(candidates, owned)}, headers
+    return attractions, headers
+
+def selected_fields(view, fields):
+    """Stored field names requested through ``view``/``fields``, None for everything"""
+    try:
+        return resolve_fields(view, fields)
+    except InvalidFields as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def response_attractions(documents, fields=None, extra=()):
+    """Stored attractions as response dicts: ``fields`` only, or whole attractions"""
+    fields = fields or ATTRACTION_FIELDS
+    return [to_response(document, fields, extra) for document in documents]
+
+@router.get("/search", response_model=List[SearchHit])
+async def search_attractions(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200, description="Search terms"),
+    limit: int = Query(10, ge=1, le=50),
+    db: AsyncIOMotorDatabase = Depends(get_database),
+):
+    """Ranked full-text search with highlighted snippets"""
+    q = q.strip()
+    
+    async def load():
+        catalog = await get_catalog(db)
+        index = catalog.search_index
+        hits = []
+        for position, score in index.search(q, limit):
+            attraction = catalog.documents[position]
+            hits.append(SearchHit(
+                id=attraction["id"],
+                name=attraction["name"],
+                image=attraction["image"],
+                category=attraction["category"],
+                rating=attraction["rating"],
+                score=round(score, 4),
+                snippet=index.snippet(position, q)
+            ))
+        return hits
+    
+    return await cached_response(request, cache_key("search", q=q, limit=limit), load)
+
+@router.get("/suggest", response_model=List[Suggestion])
+async def suggest_attractions(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=100, description="What the user typed so far"),
+    limit: int = Query(8, ge=1, le=20),
+    db: AsyncIOMotorDatabase = Depends(get_database),
+):
+    """Typeahead suggestions over attraction names, categories and activities"""
+    async def load():
+        return (await get_suggest_index(db)).suggest(q, limit)
     
-    return [Attraction(**attraction) for attraction in attractions]
+    # One entry per keystroke would crowd the cache; the index is fast anyway
+    return await cached_response(request, cache_key("suggest", q=q, limit=limit), load, store=False)
 
 @router.get("/categories")
-async def get_categories():
+async def get_categories(request: Request, db: AsyncIOMotorDatabase = Depends(get_database)):
     """Get all available categories"""
-    db = get_database()
+    async def load():
+        if READ_MODE == "snapshot":
+            return {"categories": sorted((await get_catalog(db)).by_category)}
+        categories = await db.attractions.distinct("category", {"is_active": True})
+        return {"categories": categories}
     
-    categories = await db.attractions.distinct("category", {"is_active": True})
-    return {"categories": categories}
+    return await cached_response(request, cache_key("categories"), load)
 
 @router.get("/difficulties")
-async def get_difficulties():
+async def get_difficulties(request: Request, db: AsyncIOMotorDatabase = Depends(get_database)):
     """Get all available difficulty levels"""
-    db = get_database()
+    async def load():
+        if READ_MODE == "snapshot":
+            return {"difficulties": sorted((await get_catalog(db)).by_difficulty)}
+        difficulties = await db.attractions.distinct("difficulty", {"is_active": True})
+        return {"difficulties": difficulties}
     
-    difficulties = await db.attractions.distinct("difficulty", {"is_active": True})
-    return {"difficulties": difficulties}
+    return await cached_response(request, cache_key("difficulties"), load)
 
 @router.get("/stats", response_model=AttractionStats)
-async def get_stats():
+async def get_stats(request: Request, db: AsyncIOMotorDatabase = Depends(get_database)):
     """Get attraction statistics"""
-    db = get_database()
-    
-    # Total attractions
-    total = await db.attractions.count_documents({"is_active": True})
+    async def load():
+        if READ_MODE == "snapshot":
+            return stats_from_documents((await get_catalog(db)).documents)
+        return await load_stats(db)
     
-    # By category
-    category_pipeline = [
-        {"$match": {"is_active": True}},
-        {"$group": {"_id": "$category", "count": {"$sum": 1}}}
-    ]
-    category_stats = {}
-    async for doc in db.attractions.aggregate(category_pipeline):
-        category_stats[doc["_id"]] = doc["count"]
-    
-    # By difficulty
-    difficulty_pipeline = [
-        {"$match": {"is_active": True}},
-        {"$group": {"_id": "$difficulty", "count": {"$sum": 1}}}
-    ]
-    difficulty_stats = {}
-    async for doc in db.attractions.aggregate(difficulty_pipeline):
-        difficulty_stats[doc["_id"]] = doc["count"]
-    
-    # Average rating
-    avg_pipeline = [
-        {"$match": {"is_active": True}},
-        {"$group": {"_id": None, "avg_rating": {"$avg": "$rating"}}}
-    ]
-    avg_result = await db.attractions.aggregate(avg_pipeline).to_list(1)
-    avg_rating = avg_result[0]["avg_rating"] if avg_result else 0
-    
-    # Most popular (highest rated)
-    popular_cursor = db.attractions.find(
-        {"is_active": True}
-    ).sort("rating", -1).limit(5)
-    popular_attractions = await popular_cursor.to_list(5)
-    most_popular = [attr["name"] for attr in popular_attractions]
-    
-    return AttractionStats(
-        total_attractions=total,
-        by_category=category_stats,
-        by_difficulty=difficulty_stats,
-        average_rating=round(avg_rating, 2),
-        most_popular=most_popular
-    )
+    return await cached_response(request, cache_key("stats"), load)
+
+@router.get("/changes", response_model=AttractionChanges)
+async def get_attraction_changes(
+    request: Request,
+    since: Optional[str] = Query(None, max_length=512, description="next_token of the previous sync, omit for a full sync"),
+    limit: int = Query(500, ge=1, le=1000),
+    db: AsyncIOMotorDatabase = Depends(get_database),
+):
+    """Attractions created, updated or deleted since the last sync"""
+    # Fixed for a whole lag period, so the answer only changes with writes
+    horizon = sync_horizon()
+    
+    async def load():
+        try:
+            documents, next_token, has_more = await load_changes(db, since, limit, horizon)
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        upserted, deleted = [], []
+        for document in documents:
+            if document.get("is_active", True):
+                upserted.append(to_response(document))
+            else:
+                deleted.append(document["id"])
+        return {"upserted": upserted, "deleted": deleted, "next_token": next_token, "has_more": has_more}
+    
+    key = cache_key("changes", since=since, limit=limit, horizon=horizon.isoformat())
+    return await cached_response(request, key, load, store=False, cache_control=PRIVATE_CACHE_CONTROL)
+
+@router.get("/bundle")
+async def get_bundle_manifest(request: Request):
+    """Manifest of the offline catalog bundle written by ``python cli.py bundle``"""
+    manifest, body = bundle_store.current()
+    if manifest is None:
+        raise HTTPException(status_code=404, detail="No catalog bundle has been built")
+    # Small and must be current, the bundle it points to is cached for good
+    return conditional_response(request, body, cache_control="no-cache")
+
+@router.get("/bundle/{file_name}")
+async def get_bundle_file(request: Request, file_name: str):
+    """Bundle bytes as stored, in the best encoding the client accepts"""
+    body, encoding = bundle_store.file(file_name, request.headers.get("accept-encoding", ""))
+    if body is None:
+        raise HTTPException(status_code=404, detail="Bundle not found")
+    
+    headers = {
+        # Content-addressed: a new catalog gets a new file name
+        "Cache-Control": "public, max-age=31536000, immutable",
+        # Strong validators must differ between encodings of the same bytes
+        "ETag": f'"{bundle_store.manifest["sha256"][:32]}-{encoding}"',
+        "Vary": "Accept-Encoding",
+    }
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+async def load_batch(db, ids, selected):
+    """Active attractions with ``ids``, in request order, and the ids not found.
+
+    A warm catalog snapshot answers without touching Mongo; otherwise one
+    ``$in`` query fetches them all.
+    """
+    ids = list(dict.fromkeys(ids))
+    catalog = warm_catalog()
+    if catalog is not None:
+        found = {attraction_id: catalog.by_id[attraction_id] for attraction_id in ids if attraction_id in catalog.by_id}
+    else:
+        projection = mongo_projection(selected) if selected else {"_id": 0, "location": 0}
+        cursor = db.attractions.find({"id": {"$in": ids}, "is_active": True}, projection)
+        found = {document["id"]: document for document in await cursor.to_list(len(ids))}
+    
+    return {
+        "attractions": response_attractions([found[attraction_id] for attraction_id in ids if attraction_id in found], selected),
+        "missing": [attraction_id for attraction_id in ids if attraction_id not in found],
+    }
+
+@router.get("/batch", response_model=AttractionBatch)
+async def get_attractions_batch(
+    request: Request,
+    ids: str = Query(..., min_length=1, max_length=2000, description="Comma separated attraction ids"),
+    view: Optional[str] = Query(None, pattern="^(card|detail)$", description="card: list card fields only"),
+    fields: Optional[str] = Query(None, max_length=300, description=FIELDS_DESCRIPTION),
+    db: AsyncIOMotorDatabase = Depends(get_database),
+):
+    """Get several attractions by id in one request, e.g. favorites or recently viewed"""
+    selected = selected_fields(view, fields)
+    requested = [attraction_id.strip() for attraction_id in ids.split(",") if attraction_id.strip()]
+    if not requested:
+        raise HTTPException(status_code=400, detail="No attraction ids given")
+    
+    key = cache_key("batch", ids=",".join(requested), fields=selected)
+    return await cached_response(request, key, lambda: load_batch(db, requested, selected))
+
+@router.post("/batch", response_model=AttractionBatch)
+async def post_attractions_batch(
+    request: Request,
+    query: AttractionBatchQuery,
+    db: AsyncIOMotorDatabase = Depends(get_database),
+):
+    """Same as GET /batch, for id lists too long for a URL"""
+    selected = selected_fields(query.view, query.fields)
+    return respond(request, await load_batch(db, query.ids, selected))
 
 @router.get("/{attraction_id}", response_model=Attraction)
-async def get_attraction(attraction_id: str):
+async def get_attraction(request: Request, attraction_id: str, db: AsyncIOMotorDatabase = Depends(get_database)):
     """Get a specific attraction by ID"""
-    db = get_database()
-    
-    attraction = await db.attractions.find_one({
-        "id": attraction_id,
-        "is_active": True
-    })
-    
-    if not attraction:
-        raise HTTPException(status_code=404, detail="Attraction not found")
-    
-    # Convert field names for Pydantic compatibility
-    if 'full_description' in attraction:
-        attraction['fullDescription'] = attraction.pop('full_description')
-    
-    return Attraction(**attraction)
+    async def load():
+        if READ_MODE == "snapshot":
+            attraction = (await get_catalog(db)).by_id.get(attraction_id)
+        else:
+            attraction = await db.attractions.find_one({
+                "id": attraction_id,
+                "is_active": True
+            }, {"_id": 0, "location": 0})
+        
+        if not attraction:
+            raise HTTPException(status_code=404, detail="Attraction not found")
+        
+        return to_response(attraction)
+    
+    return await cached_response(request, cache_key("attraction", id=attraction_id), load)
 
 @router.post("/", response_model=Attraction)
-async def create_attraction(attraction: AttractionCreate):
+async def create_attraction(
+    attraction: AttractionCreate,
+    db: AsyncIOMotorDatabase = Depends(get_database),
+):
     """Create a new attraction"""
-    db = get_database()
-    
     # Convert to Attraction model
-    attraction_data = attraction.dict(by_alias=True)
-    new_attraction = Attraction(**attraction_data)
+    new_attraction = Attraction(**attraction.dict(), **normalized_fields(attraction.dict()))
     
-    # Insert to database
-    result = await db.attractions.insert_one(new_attraction.dict(by_alias=True))
+    # Insert to database under the stored field names (full_description),
+    # with the GeoJSON point used by nearby search
+    document = new_attraction.dict()
+    location = to_geojson_point(new_attraction.coordinates)
+    if location:
+        document["location"] = location
+    result = await db.attractions.insert_one(document)
     
     if not result.inserted_id:
         raise HTTPException(status_code=500, detail="Failed to create attraction")
     
+    await catalog_changed(db, None, new_attraction.dict())
     return new_attraction
 
+@router.post("/bulk", response_model=BulkImportReport)
+async def bulk_import_attractions(request: Request, db: AsyncIOMotorDatabase = Depends(get_database)):
+    """Create or replace attractions from an NDJSON body (one attraction with its id per line)"""
+    report = await bulk_upsert(db, request.stream())
+    if report["inserted"] or report["updated"]:
+        # Too many rows to fold into the incremental indexes, rebuild them instead
+        await publish_write(db)
+    return report
+
 @router.put("/{attraction_id}", response_model=Attraction)
-async def update_attraction(attraction_id: str, attraction_update: AttractionUpdate):
+async def update_attraction(
+    attraction_id: str,
+    attraction_update: AttractionUpdate,
+    db: AsyncIOMotorDatabase = Depends(get_database),
+):
     """Update an existing attraction"""
-    db = get_database()
-    
-    # Check if attraction exists
-    existing = await db.attractions.find_one({
-        "id": attraction_id,
-        "is_active": True
-    })
-    
-    if not existing:
-        raise HTTPException(status_code=404, detail="Attraction not found")
-    
-    # Update fields
-    update_data = attraction_update.dict(exclude_unset=True, by_alias=True)
+    update_data = attraction_update.dict(exclude_unset=True)
+    update_data.update(normalized_fields(update_data))
     update_data["updated_at"] = datetime.utcnow()
+    if "coordinates" in update_data:
+        update_data["location"] = to_geojson_point(update_data["coordinates"])
+    
+    update = {"$set": update_data}
+    if "full_description" in update_data:
+        # Documents written by older versions kept the camelCase name
+        update["$unset"] = {"fullDescription": ""}
     
-    result = await db.attractions.update_one(
-        {"id": attraction_id},
-        {"$set": update_data}
+    # One round trip: the previous version comes back for the derived
+    # structures, and the new one follows from it and the update
+    existing = await db.attractions.find_one_and_update(
+        {"id": attraction_id, "is_active": True},
+        update,
+        projection={"_id": 0},
+        return_document=ReturnDocument.BEFORE
     )
     
-    if result.modified_count == 0:
-        raise HTTPException(status_code=500, detail="Failed to update attraction")
+    if not existing:
+        raise HTTPException(status_code=404, detail="Attraction not found")
     
-    # Return updated attraction
-    updated = await db.attractions.find_one({"id": attraction_id})
-    return Attraction(**updated)
+    updated = {**existing, **update_data}
+    if "$unset" in update:
+        updated.pop("fullDescription", None)
+    await catalog_changed(db, existing, updated)
+    return to_response(updated)
 
 @router.delete("/{attraction_id}")
-async def delete_attraction(attraction_id: str):
+async def delete_attraction(attraction_id: str, db: AsyncIOMotorDatabase = Depends(get_database)):
     """Soft delete an attraction (set is_active to False)"""
-    db = get_database()
-    
-    result = await db.attractions.update_one(
+    deleted = await db.attractions.find_one_and_update(
         {"id": attraction_id, "is_active": True},
-        {"$set": {"is_active": False, "updated_at": datetime.utcnow()}}
+        {"$set": {"is_active": False, "updated_at": datetime.utcnow()}},
+        projection={**STATS_FIELDS, "id": 1},
+        return_document=ReturnDocument.BEFORE
     )
     
-    if result.modified_count == 0:
+    if not deleted:
         raise HTTPException(status_code=404, detail="Attraction not found")
     
+    await catalog_changed(db, deleted, {**deleted, "is_active": False})
     return {"message": "Attraction deleted successfully"}
 
 # Favorites endpoints
 @router.post("/favorites", response_model=UserFavorite)
-async def add_favorite(favorite: UserFavoriteCreate):
+async def add_favorite(
+    favorite: UserFavoriteCreate,
+    db: AsyncIOMotorDatabase = Depends(get_database),
+):
     """Add attraction to user favorites"""
-    db = get_database()
-    
-    # Check if attraction exists
-    attraction = await db.attractions.find_one({
-        "id": favorite.attraction_id,
-        "is_active": True
-    })
-    
-    if not attraction:
+    catalog = warm_catalog()
+    if catalog is not None:
+        exists = favorite.attraction_id in catalog.by_id
+    else:
+        exists = await db.attractions.find_one(
+            {"id": favorite.attraction_id, "is_active": True}, {"_id": 1}
+        ) is not None
+    
+    if not exists:
         raise HTTPException(status_code=404, detail="Attraction not found")
     
-    # Check if already favorited
-    existing = await db.favorites.find_one({
-        "user_id": favorite.user_id,
-        "attraction_id": favorite.attraction_id
-    })
-    
-    if existing:
-        raise HTTPException(status_code=400, detail="Already in favorites")
-    
-    # Create favorite
+    # The unique (user_id, attraction_id) index decides between concurrent
+    # adds of the same favorite, there is no check-then-insert window
     new_favorite = UserFavorite(**favorite.dict())
-    result = await db.favorites.insert_one(new_favorite.dict())
-    
-    if not result.inserted_id:
-        raise HTTPException(status_code=500, detail="Failed to add favorite")
+    try:
+        await db.favorites.insert_one(new_favorite.dict())
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Already in favorites")
     
     return new_favorite
 
-@router.get("/favorites/{user_id}", response_model=List[Attraction])
-async def get_user_favorites(user_id: str):
+@router.get("/favorites/{user_id}", response_model=Union[List[Attraction], List[AttractionCard]])
+async def get_user_favorites(
+    request: Request,
+    user_id: str,
+    view: Optional[str] = Query(None, pattern="^(card|detail)$", description="card: list card fields only"),
+    fields: Optional[str] = Query(None, max_length=300, description=FIELDS_DESCRIPTION),
+    db: AsyncIOMotorDatabase = Depends(get_database),
+):
     """Get user's favorite attractions"""
-    db = get_database()
+    selected = selected_fields(view, fields)
     
-    # Get favorite attraction IDs
-    favorites_cursor = db.favorites.find({"user_id": user_id})
+    # Favorites change without a catalog write, so their ids (covered by the
+    # user_attraction_unique index) are part of the validator and clients
+    # always revalidate; the attractions are only loaded when it changed
+    favorites_cursor = db.favorites.find({"user_id": user_id}, {"_id": 0, "attraction_id": 1})
     favorites = await favorites_cursor.to_list(1000)
     attraction_ids = [fav["attraction_id"] for fav in favorites]
     
-    if not attraction_ids:
-        return []
-    
-    # Get attractions
-    attractions_cursor = db.attractions.find({
-        "id": {"$in": attraction_ids},
-        "is_active": True
-    })
-    attractions = await attractions_cursor.to_list(1000)
-    
-    # Convert field names for Pydantic compatibility
-    for attraction in attractions:
-        if 'full_description' in attraction:
-            attraction['fullDescription'] = attraction.pop('full_description')
-    
-    return [Attraction(**attraction) for attraction in attractions]
+    async def load():
+        if not attraction_ids:
+            return []
+        if READ_MODE == "snapshot":
+            catalog = await get_catalog(db)
+            attractions = [catalog.by_id[attraction_id] for attraction_id in attraction_ids if attraction_id in catalog.by_id]
+        else:
+            attractions_cursor = db.attractions.find({
+                "id": {"$in": attraction_ids},
+                "is_active": True
+            }, mongo_projection(selected) if selected else None)
+            attractions = await attractions_cursor.to_list(1000)
+        return response_attractions(attractions, selected)
+    
+    key = cache_key("favorites", user_id=user_id, ids=tuple(attraction_ids), fields=selected)
+    return await cached_response(request, key, load, store=False, cache_control=PRIVATE_CACHE_CONTROL)
 
 @router.delete("/favorites/{user_id}/{attraction_id}")
-async def remove_favorite(user_id: str, attraction_id: str):
+async def remove_favorite(
+    user_id: str,
+    attraction_id: str,
+    db: AsyncIOMotorDatabase = Depends(get_database),
+):
     """Remove attraction from user favorites"""
-    db = get_database()
-    
     result = await db.favorites.delete_one({
         "user_id": user_id,
         "attraction_id": attraction_id
@@ -292,46 +706,97 @@ async def remove_favorite(user_id: str, attraction_id: str):
     
     return {"message": "Favorite removed successfully"}
 
-@router.get("/nearby/{lat}/{lon}")
+@router.get("/nearby/{lat}/{lon}", response_model=Union[List[NearbyAttraction], List[NearbyAttractionCard]])
 async def get_nearby_attractions(
-    lat: float,
-    lon: float,
-    radius_km: float = Query(50, description="Search radius in kilometers"),
-    limit: int = Query(10, ge=1, le=50)
+    request: Request,
+    lat: float = Path(..., ge=-90, le=90),
+    lon: float = Path(..., ge=-180, le=180),
+    radius_km: float = Query(50, gt=0, description="Search radius in kilometers"),
+    limit: int = Query(10, ge=1, le=50),
+    view: Optional[str] = Query(None, pattern="^(card|detail)$", description="card: list card fields only"),
+    fields: Optional[str] = Query(None, max_length=300, description=FIELDS_DESCRIPTION),
+    db: AsyncIOMotorDatabase = Depends(get_database),
 ):
-    """Get attractions near a location (simplified distance calculation)"""
-    db = get_database()
-    
-    # Get all attractions
-    attractions = await db.attractions.find({"is_active": True}).to_list(1000)
-    
-    # Calculate distances (simplified Haversine)
-    nearby_attractions = []
-    for attraction in attractions:
-        coords = attraction.get("coordinates", "").split(",")
-        if len(coords) == 2:
+    """Get attractions near a location, closest first (great-circle distance)"""
+    selected = selected_fields(view, fields)
+
+    async def load():
+        if GEO_MODE == "mongo" and READ_MODE != "snapshot":
             try:
-                attr_lat = float(coords[0].strip())
-                attr_lon = float(coords[1].strip())
-                
-                # Simplified distance calculation
-                lat_diff = lat - attr_lat
-                lon_diff = lon - attr_lon
-                distance = (lat_diff ** 2 + lon_diff ** 2) ** 0.5 * 111  # Rough km conversion
-                
-                if distance <= radius_km:
-                    attraction["calculated_distance"] = round(distance, 2)
-                    nearby_attractions.append(attraction)
-            except:
-                continue
-    
-    # Sort by distance and limit
-    nearby_attractions.sort(key=lambda x: x.get("calculated_distance", float("inf")))
-    nearby_attractions = nearby_attractions[:limit]
-    
-    # Convert field names for Pydantic compatibility
-    for attraction in nearby_attractions:
-        if 'full_description' in attraction:
-            attraction['fullDescription'] = attraction.pop('full_description')
-    
-    return [Attraction(**attraction) for attraction in nearby_attractions]
\ No newline at end of file
+                nearby_attractions = await geo_near(db, lat, lon, radius_km, limit, selected)
+            except OperationFailure as e:
+                # Typically the location_2dsphere index is missing
+                logger.warning(f"$geoNear failed, serving nearby from memory: {e}")
+                nearby_attractions = await nearby_in_memory(db, lat, lon, radius_km, limit)
+        else:
+            nearby_attractions = await nearby_in_memory(db, lat, lon, radius_km, limit)
+        return response_attractions(nearby_attractions, selected, extra=("calculated_distance",))
+
+    # Not cached (coordinates rarely repeat), but a crowd at one spot sends the
+    # same request, and revalidations are still answered from the version
+    key = cache_key("nearby", lat=lat, lon=lon, radius_km=radius_km, limit=limit, fields=selected)
+    return await cached_response(request, key, load, store=False)
+
+async def geo_near(db, lat, lon, radius_km, limit, fields=None):
+    """Nearby attractions through $geoNear on the location_2dsphere index"""
+    pipeline = [
+        {"$geoNear": {
+            "near": {"type": "Point", "coordinates": [lon, lat]},
+            "key": "location",
+            "distanceField": "calculated_distance",
+            "distanceMultiplier": 0.001,  # meters to km
+            "maxDistance": radius_km * 1000,
+            "spherical": True,
+            "query": {"is_active": True},
+        }},
+        {"$limit": limit},
+    ]
+    if fields:
+        pipeline.append({"$project": {**mongo_projection(fields), "calculated_distance": 1}})
+    attractions = await db.attractions.aggregate(pipeline).to_list(limit)
+    for attraction in attractions:
+        attraction["calculated_distance"] = round(attraction["calculated_distance"], 2)
+    return attractions
+
+async def nearby_in_memory(db, lat, lon, radius_km, limit):
+    """Nearby attractions from the grid index of the catalog snapshot"""
+    catalog = await get_catalog(db)
+    rows, distances = catalog.spatial_index.nearby(lat, lon, radius_km, limit)
+    return [
+        {**catalog.documents[position], "calculated_distance": round(float(distance), 2)}
+        for position, distance in zip(catalog.positions[rows].tolist(), distances)
+    ]
+
+MAX_ROUTE_POINTS = 5000
+
+@router.post("/along-route", response_model=List[RouteAttraction])
+async def get_attractions_along_route(
+    query: RouteCorridorQuery,
+    db: AsyncIOMotorDatabase = Depends(get_database),
+):
+    """Get attractions within a corridor around a route, in driving order"""
+    if query.polyline:
+        try:
+            route = decode_polyline(query.polyline)
+        except (ValueError, IndexError):
+            raise HTTPException(status_code=400, detail="Invalid encoded polyline")
+    else:
+        route = [tuple(point) for point in query.coordinates or []]
+    
+    if len(route) < 2 or len(route) > MAX_ROUTE_POINTS:
+        raise HTTPException(status_code=400, detail=f"Route must have between 2 and {MAX_ROUTE_POINTS} points")
+    if any(len(point) != 2 or not (-90 <= point[0] <= 90 and -180 <= point[1] <= 180) for point in route):
+        raise HTTPException(status_code=400, detail="Route points must be [lat, lon] pairs")
+    
+    catalog = await get_catalog(db)
+    rows, offsets, positions = corridor_match(catalog.lat, catalog.lon, route, query.width_km)
+    
+    attractions = []
+    for position, offset, along in zip(catalog.positions[rows[:query.limit]].tolist(), offsets, positions):
+        attraction = to_response(catalog.documents[position])
+        attraction["distance_from_route_km"] = round(float(offset), 2)
+        attraction["route_position_km"] = round(float(along), 2)
+        attractions.append(attraction)
+    
+    # Already response shaped, skip the response_model validation
+    return JSONResponse(attractions)
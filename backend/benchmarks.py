@@ -0,0 +1,307 @@
+"""
+Micro-benchmarks for the read path, run through ``python cli.py bench ...``
+
+Catalogs are synthetic: the initial attractions are cloned with new ids and
+coordinates scattered around Bonito, so results do not depend on the data
+currently in MongoDB.
+"""
+
+from compression import compress
+from data.initial_attractions import get_initial_attractions
+from fastapi.encoders import jsonable_encoder
+from models import Attraction
+from pydantic import TypeAdapter
+from serialization import json_bytes, msgpack_bytes, to_response
+from geo import GridIndex, haversine_km, parse_coordinates, to_geojson_point
+from search import SearchIndex
+from suggest import SuggestIndex
+from voice import VoiceIndex
+from datetime import datetime
+import itertools
+import json
+import msgpack
+import orjson
+import numpy as np
+import random
+import time
+
+BONITO = (-21.1261, -56.4836)
+
+
+def synthetic_attractions(count, seed=42, spread_degrees=2.0):
+    """Clone the initial attractions ``count`` times around Bonito"""
+    rng = random.Random(seed)
+    templates = get_initial_attractions()
+    attractions = []
+    for number in range(count):
+        attraction = dict(templates[number % len(templates)])
+        lat = BONITO[0] + rng.uniform(-spread_degrees, spread_degrees)
+        lon = BONITO[1] + rng.uniform(-spread_degrees, spread_degrees)
+        attraction["id"] = f"{attraction['id']}-{number}"
+        attraction["name"] = f"{attraction['name']} {number}"
+        attraction["coordinates"] = f"{lat:.4f}, {lon:.4f}"
+        attraction["location"] = to_geojson_point(attraction["coordinates"])
+        attraction["rating"] = round(rng.uniform(3.0, 5.0), 1)
+        attractions.append(attraction)
+    return attractions
+
+
+def timed(function, repeat):
+    """Mean wall time of ``function()`` in milliseconds"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def legacy_nearby(attractions, lat, lon, radius_km, limit):
+    """The original per-request loop: string parsing and flat-earth distance"""
+    nearby_attractions = []
+    for attraction in attractions:
+        coords = attraction.get("coordinates", "").split(",")
+        if len(coords) == 2:
+            try:
+                attr_lat = float(coords[0].strip())
+                attr_lon = float(coords[1].strip())
+                distance = ((lat - attr_lat) ** 2 + (lon - attr_lon) ** 2) ** 0.5 * 111
+                if distance <= radius_km:
+                    nearby_attractions.append((distance, attraction))
+            except ValueError:
+                continue
+    nearby_attractions.sort(key=lambda item: item[0])
+    return nearby_attractions[:limit]
+
+
+def bench_nearby(sizes, queries=200, radius_km=50, limit=10, seed=7):
+    """Compare the legacy loop, a vectorized full scan and the grid index"""
+    rng = random.Random(seed)
+    points = [
+        (BONITO[0] + rng.uniform(-1.5, 1.5), BONITO[1] + rng.uniform(-1.5, 1.5))
+        for _ in range(queries)
+    ]
+    results = []
+    for size in sizes:
+        attractions = synthetic_attractions(size)
+        parsed = [parse_coordinates(attraction["coordinates"]) for attraction in attractions]
+        lat = np.array([point[0] for point in parsed])
+        lon = np.array([point[1] for point in parsed])
+
+        build_start = time.perf_counter()
+        grid = GridIndex(lat, lon)
+        build_ms = (time.perf_counter() - build_start) * 1000
+
+        def full_scan(query_lat, query_lon):
+            distances = haversine_km(query_lat, query_lon, lat, lon)
+            inside = np.flatnonzero(distances <= radius_km)
+            return inside[np.argsort(distances[inside])[:limit]]
+
+        iterations = itertools.cycle(points)
+        legacy_repeat = max(1, min(queries, 2_000_000 // size))
+        results.append({
+            "size": size,
+            "legacy_loop_ms": timed(lambda: legacy_nearby(attractions, *next(iterations), radius_km, limit), legacy_repeat),
+            "numpy_scan_ms": timed(lambda: full_scan(*next(iterations)), queries),
+            "grid_index_ms": timed(lambda: grid.nearby(*next(iterations), radius_km, limit), queries),
+            "grid_build_ms": build_ms,
+        })
+    return results
+
+
+def bench_search(sizes, repeat=1000):
+    """Index build time and per-query latency of the full-text index"""
+    queries = ["cachoeira", "Cachoeíra", "grutas azuis", "flutuação rio", "trilha", "mergulho"]
+    results = []
+    for size in sizes:
+        attractions = synthetic_attractions(size)
+        build_start = time.perf_counter()
+        index = SearchIndex(attractions)
+        build_ms = (time.perf_counter() - build_start) * 1000
+
+        iterations = itertools.cycle(queries)
+        results.append({
+            "size": size,
+            "build_ms": build_ms,
+            "query_top10_ms": timed(lambda: index.search(next(iterations), 10), repeat),
+            "snippet_ms": timed(lambda: index.snippet(0, next(iterations)), repeat),
+        })
+    return results
+
+
+def bench_suggest(sizes, repeat=20000):
+    """Per-keystroke latency percentiles of the typeahead index"""
+    prefixes = ["g", "gr", "gru", "grut", "rio d", "lago", "flu", "aven", "buraco das", "x"]
+    results = []
+    for size in sizes:
+        attractions = synthetic_attractions(size)
+        build_start = time.perf_counter()
+        index = SuggestIndex(attractions)
+        build_ms = (time.perf_counter() - build_start) * 1000
+
+        samples = []
+        iterations = itertools.cycle(prefixes)
+        for _ in range(repeat):
+            prefix = next(iterations)
+            start = time.perf_counter()
+            index.suggest(prefix)
+            samples.append((time.perf_counter() - start) * 1_000_000)
+        samples.sort()
+
+        update_start = time.perf_counter()
+        index.upsert(dict(attractions[0], name="Renamed attraction"))
+        upsert_us = (time.perf_counter() - update_start) * 1_000_000
+
+        results.append({
+            "size": size,
+            "build_ms": build_ms,
+            "p50_us": samples[len(samples) // 2],
+            "p99_us": samples[int(len(samples) * 0.99)],
+            "upsert_us": upsert_us,
+        })
+    return results
+
+
+def bench_voice(sizes, repeat=2000):
+    """Index build time and per-transcript resolution latency of the voice resolver"""
+    transcripts = [
+        "gruta lago azul", "navegar para o rio da prata", "grutas perto de mim",
+        "abismo aniumas", "cachoeiras", "favoritos", "abre a boca da onsa por favor",
+    ]
+    results = []
+    for size in sizes:
+        attractions = synthetic_attractions(size)
+        build_start = time.perf_counter()
+        index = VoiceIndex(attractions)
+        build_ms = (time.perf_counter() - build_start) * 1000
+
+        iterations = itertools.cycle(transcripts)
+        results.append({
+            "size": size,
+            "build_ms": build_ms,
+            "resolve_ms": timed(lambda: index.resolve(next(iterations)), repeat),
+        })
+    return results
+
+
+def legacy_json(attractions):
+    """FastAPI's default path: validate, jsonable_encoder, then json.dumps"""
+    return json.dumps(
+        jsonable_encoder(attractions),
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def bench_serialization(sizes, repeat=200):
+    """Body size and CPU of a GET /api/attractions page: JSON encoders and compression"""
+    results = []
+    for size in sizes:
+        attractions = []
+        for document in synthetic_attractions(size):
+            document = dict(document)
+            document["fullDescription"] = document.pop("full_description")
+            attractions.append(Attraction(**document))
+
+        body = json_bytes(attractions)
+        gzipped = compress(body, "gzip")
+        brotlied = compress(body, "br")
+        results.append({
+            "size": size,
+            "stdlib_json_ms": timed(lambda: legacy_json(attractions), repeat),
+            "orjson_ms": timed(lambda: json_bytes(attractions), repeat),
+            "raw_bytes": len(body),
+            "gzip_bytes": len(gzipped),
+            "br_bytes": len(brotlied),
+            "gzip_ms": timed(lambda: compress(body, "gzip"), repeat),
+            "br_ms": timed(lambda: compress(body, "br"), repeat),
+        })
+    return results
+
+
+def bench_msgpack(sizes, repeat=200):
+    """Size and encode/decode time of a listing page as JSON and as MessagePack"""
+    results = []
+    for size in sizes:
+        attractions = []
+        for document in synthetic_attractions(size):
+            document = dict(document)
+            document["fullDescription"] = document.pop("full_description")
+            attractions.append(Attraction(**document))
+
+        json_body = json_bytes(attractions)
+        msgpack_body = msgpack_bytes(attractions)
+        results.append({
+            "size": size,
+            "json_bytes": len(json_body),
+            "msgpack_bytes": len(msgpack_body),
+            "json_encode_ms": timed(lambda: json_bytes(attractions), repeat),
+            "msgpack_encode_ms": timed(lambda: msgpack_bytes(attractions), repeat),
+            "json_decode_ms": timed(lambda: orjson.loads(json_body), repeat),
+            "stdlib_json_decode_ms": timed(lambda: json.loads(json_body), repeat),
+            "msgpack_decode_ms": timed(lambda: msgpack.unpackb(msgpack_body), repeat),
+        })
+    return results
+
+
+def legacy_response(documents, adapter):
+    """The model based read path: rename, Attraction(**), then response_model re-validation"""
+    attractions = []
+    for document in documents:
+        document = dict(document)
+        document["fullDescription"] = document.pop("full_description")
+        attractions.append(Attraction(**document))
+    content = adapter.dump_python(adapter.validate_python(attractions), mode="json", by_alias=True)
+    return json_bytes(content)
+
+
+def bench_convert(sizes, repeat=50):
+    """Stored documents to response bytes: through the models vs the trusted converter"""
+    adapter = TypeAdapter(list[Attraction])
+    now = datetime.utcnow()
+    results = []
+    for size in sizes:
+        documents = [
+            {**document, "created_at": now, "updated_at": now, "is_active": True}
+            for document in synthetic_attractions(size)
+        ]
+        models_ms = timed(lambda: legacy_response(documents, adapter), repeat)
+        converter_ms = timed(lambda: json_bytes([to_response(document) for document in documents]), repeat)
+        results.append({
+            "size": size,
+            "models_ms": models_ms,
+            "converter_ms": converter_ms,
+            "models_us_per_row": models_ms * 1000 / size,
+            "converter_us_per_row": converter_ms * 1000 / size,
+        })
+    return results
+
+
+async def bench_geo_near(db, sizes, queries=50, radius_km=50, limit=10, seed=7):
+    """Time $geoNear on a scratch collection filled with synthetic attractions"""
+    rng = random.Random(seed)
+    collection = db.bench_attractions
+    results = []
+    try:
+        for size in sizes:
+            await collection.drop()
+            await collection.insert_many(synthetic_attractions(size))
+            await collection.create_index([("location", "2dsphere")])
+
+            start = time.perf_counter()
+            for _ in range(queries):
+                lat = BONITO[0] + rng.uniform(-1.5, 1.5)
+                lon = BONITO[1] + rng.uniform(-1.5, 1.5)
+                await collection.aggregate([
+                    {"$geoNear": {
+                        "near": {"type": "Point", "coordinates": [lon, lat]},
+                        "distanceField": "calculated_distance",
+                        "maxDistance": radius_km * 1000,
+                        "spherical": True,
+                        "query": {"is_active": True},
+                    }},
+                    {"$limit": limit},
+                ]).to_list(limit)
+            results.append({"size": size, "geo_near_ms": (time.perf_counter() - start) * 1000 / queries})
+    finally:
+        await collection.drop()
+    return results
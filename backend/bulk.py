@@ -0,0 +1,170 @@
+"""
+Bulk import of attractions from NDJSON
+
+Each line is one attraction in the API shape (``fullDescription`` or
+``full_description``) with its ``id``. Lines are validated and written in
+chunks of unordered ``bulk_write`` upserts keyed on ``id``, and while one
+chunk is being written the next one is validated, so a large catalog loads
+at the speed of the database rather than one request per attraction.
+"""
+
+from datetime import datetime
+from geo import to_geojson_point
+from models import AttractionImport
+from normalization import normalized_fields
+from pydantic import ValidationError
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from stats import STATS_MODE, rebuild_materialized_stats
+import asyncio
+import orjson
+import os
+import time
+
+BULK_CHUNK_SIZE = int(os.environ.get("ATTRACTIONS_BULK_CHUNK_SIZE", 1000))
+BULK_MAX_REPORTED_ERRORS = 100
+
+
+async def iter_lines(chunks):
+    """Lines of a stream of byte chunks, without holding the whole body"""
+    pending = b""
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line
+    if pending:
+        yield pending
+
+
+def _describe(error):
+    return "; ".join(
+        f"{'.'.join(str(part) for part in detail['loc'])}: {detail['msg']}" if detail["loc"] else detail["msg"]
+        for detail in error.errors()
+    )
+
+
+def _row_id(line):
+    """Best effort id of a line that failed validation, for the error report"""
+    try:
+        row = orjson.loads(line)
+    except orjson.JSONDecodeError:
+        return None
+    attraction_id = row.get("id") if isinstance(row, dict) else None
+    return attraction_id if isinstance(attraction_id, str) else None
+
+
+def upsert_operation(attraction, now):
+    """UpdateOne writing a validated row, keeping created_at of existing attractions"""
+    document = attraction.model_dump()
+    document.update(normalized_fields(document))
+    document["updated_at"] = now
+    update = {
+        "$set": document,
+        "$setOnInsert": {"created_at": now},
+        # Documents written by older versions kept the camelCase name
+        "$unset": {"fullDescription": ""},
+    }
+    location = to_geojson_point(attraction.coordinates)
+    if location:
+        document["location"] = location
+    else:
+        update["$unset"]["location"] = ""
+    return UpdateOne({"id": attraction.id}, update, upsert=True)
+
+
+class BulkImport:
+    """Counters and errors of one import"""
+
+    def __init__(self):
+        self.received = 0
+        self.inserted = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors = []
+        self.started = time.perf_counter()
+
+    def error(self, line, attraction_id, message):
+        self.failed += 1
+        if len(self.errors) < BULK_MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "id": attraction_id, "error": message})
+
+    async def write(self, collection, attractions, rows):
+        """Upsert one chunk of validated rows, recording those the server rejected.
+
+        ``rows`` holds the (line, id) of each attraction. updated_at is
+        stamped here, per chunk: one timestamp for the whole import would
+        put rows committed late behind sync tokens handed out meanwhile.
+        """
+        now = datetime.utcnow()
+        operations = [upsert_operation(attraction, now) for attraction in attractions]
+        try:
+            result = (await collection.bulk_write(operations, ordered=False)).bulk_api_result
+        except BulkWriteError as e:
+            result = e.details
+            for failure in result["writeErrors"]:
+                self.error(*rows[failure["index"]], failure["errmsg"])
+        self.inserted += result["nUpserted"]
+        self.updated += result["nMatched"]
+
+    def report(self):
+        seconds = time.perf_counter() - self.started
+        return {
+            "received": self.received,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "failed": self.failed,
+            "errors": self.errors,
+            "seconds": round(seconds, 3),
+            "rows_per_second": round(self.received / seconds, 1) if seconds else 0.0,
+        }
+
+
+async def bulk_upsert(db, chunks, chunk_size=BULK_CHUNK_SIZE):
+    """Upsert the NDJSON attractions read from ``chunks`` (async iterable of bytes).
+
+    Returns the BulkImportReport fields. Invalid rows are reported with
+    their line number and skipped; the other rows are still written.
+    """
+    state = BulkImport()
+    attractions, rows = [], []
+    seen = {}
+    writing = None
+
+    async def flush():
+        # Validation of the next chunk overlaps with this write
+        nonlocal writing, attractions, rows
+        if writing is not None:
+            await writing
+        writing = asyncio.ensure_future(state.write(db.attractions, attractions, rows)) if attractions else None
+        attractions, rows = [], []
+
+    number = 0
+    async for line in iter_lines(chunks):
+        number += 1
+        if not line.strip():
+            continue
+        state.received += 1
+        try:
+            attraction = AttractionImport.model_validate_json(line)
+        except ValidationError as e:
+            state.error(number, _row_id(line), _describe(e))
+            continue
+        if attraction.id in seen:
+            # Unordered upserts of the same id would race each other
+            state.error(number, attraction.id, f"Duplicate id, first seen on line {seen[attraction.id]}")
+            continue
+        seen[attraction.id] = number
+        attractions.append(attraction)
+        rows.append((number, attraction.id))
+        if len(attractions) >= chunk_size:
+            await flush()
+
+    await flush()
+    if writing is not None:
+        await writing
+
+    if STATS_MODE == "materialized" and (state.inserted or state.updated):
+        # Cheaper than applying a counter difference per row
+        await rebuild_materialized_stats(db)
+    return state.report()
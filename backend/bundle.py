@@ -0,0 +1,136 @@
+"""
+Offline catalog bundle
+
+``python cli.py bundle`` writes every active attraction as one JSON file
+named after its content hash, with gzip and brotli copies next to it and a
+``manifest.json`` pointing at the current one. The API serves those bytes
+as they are, and because the name changes with the content, clients can
+cache a bundle forever and only refetch the manifest.
+"""
+
+from datetime import datetime
+from serialization import json_bytes, to_response
+from sync import encode_token, sync_horizon
+from pathlib import Path
+import gzip
+import hashlib
+import json
+import os
+
+try:
+    import brotli
+except ImportError:  # brotli copies are skipped, gzip is always available
+    brotli = None
+
+BUNDLE_DIR = Path(os.environ.get("ATTRACTIONS_BUNDLE_DIR", Path(__file__).parent / "bundle"))
+MANIFEST_NAME = "manifest.json"
+BUNDLE_PREFIX = "attractions."
+
+# Suffix of each stored copy, by Content-Encoding
+ENCODINGS = {"br": ".br", "gzip": ".gz", "identity": ""}
+
+
+def bundle_body(documents):
+    """Deterministic JSON of ``documents``, shaped like the API responses"""
+    documents = sorted(documents, key=lambda document: document["id"])
+    return json_bytes([to_response(document) for document in documents])
+
+
+def write_bundle(documents, directory=BUNDLE_DIR, with_sync_token=True):
+    """Write the bundle files and manifest for ``documents``, returning the manifest.
+
+    ``with_sync_token`` records where /changes should continue from; leave it
+    off for documents that were not read from the database.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    documents = [document for document in documents if document.get("is_active", True)]
+    body = bundle_body(documents)
+    digest = hashlib.sha256(body).hexdigest()
+    name = f"{BUNDLE_PREFIX}{digest[:16]}.json"
+
+    copies = {"identity": body, "gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        copies["br"] = brotli.compress(body, quality=11)
+
+    for encoding, data in copies.items():
+        (directory / (name + ENCODINGS[encoding])).write_bytes(data)
+
+    # Clients bootstrap from the bundle, then ask /changes for what came after.
+    # Like /changes, never past the sync horizon: a write stamped earlier may
+    # still commit. Documents after it are sent again, which is harmless.
+    latest = max(
+        ((document["updated_at"], document["id"]) for document in documents if document.get("updated_at")),
+        default=None,
+    )
+    horizon = sync_horizon()
+    if latest and latest[0] > horizon:
+        latest = (horizon, "")
+    manifest = {
+        "file": name,
+        "sha256": digest,
+        "count": len(documents),
+        "sizes": {encoding: len(data) for encoding, data in copies.items()},
+        "sync_token": encode_token(*latest) if latest and with_sync_token else None,
+        "generated_at": datetime.utcnow().isoformat(),
+    }
+    # Write the manifest last and atomically, so readers never see it point
+    # at files that are not there yet
+    temporary = directory / (MANIFEST_NAME + ".tmp")
+    temporary.write_text(json.dumps(manifest, indent=2))
+    os.replace(temporary, directory / MANIFEST_NAME)
+
+    for stale in directory.glob(BUNDLE_PREFIX + "*"):
+        if not stale.name.startswith(name):
+            stale.unlink()
+    return manifest
+
+
+class BundleStore:
+    """Serves the bundle files from memory, reloading when the manifest changes"""
+
+    def __init__(self, directory=BUNDLE_DIR):
+        self.directory = Path(directory)
+        self._mtime = None
+        self.manifest = None
+        self.manifest_body = None
+        self._copies = {}
+
+    def _refresh(self):
+        path = self.directory / MANIFEST_NAME
+        try:
+            mtime = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            self._mtime, self.manifest, self.manifest_body, self._copies = None, None, None, {}
+            return
+        if mtime == self._mtime:
+            return
+
+        manifest_body = path.read_bytes()
+        manifest = json.loads(manifest_body)
+        copies = {}
+        for encoding, suffix in ENCODINGS.items():
+            file = self.directory / (manifest["file"] + suffix)
+            if file.exists():
+                copies[encoding] = file.read_bytes()
+        self._mtime, self.manifest, self.manifest_body, self._copies = mtime, manifest, manifest_body, copies
+
+    def current(self):
+        """The manifest dict and its raw bytes, or (None, None) without a bundle"""
+        self._refresh()
+        return self.manifest, self.manifest_body
+
+    def file(self, name, accept_encoding=""):
+        """``(bytes, content_encoding)`` of bundle ``name`` in the best accepted encoding"""
+        self._refresh()
+        if self.manifest is None or name != self.manifest["file"]:
+            return None, None
+        accepted = {part.split(";")[0].strip() for part in accept_encoding.lower().split(",")}
+        for encoding in ("br", "gzip"):
+            if encoding in accepted and encoding in self._copies:
+                return self._copies[encoding], encoding
+        return self._copies.get("identity"), "identity"
+
+
+bundle_store = BundleStore()
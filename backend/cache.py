@@ -0,0 +1,241 @@
+from collections import OrderedDict
+import asyncio
+import hashlib
+import os
+import time
+
+# HTTP caching of read responses. Browsers and proxies may reuse a response
+# for max-age seconds, then keep serving it for stale-while-revalidate more
+# while they revalidate it with If-None-Match in the background.
+HTTP_MAX_AGE = int(os.environ.get("ATTRACTIONS_HTTP_MAX_AGE", 60))
+HTTP_STALE_WHILE_REVALIDATE = int(os.environ.get("ATTRACTIONS_HTTP_STALE_WHILE_REVALIDATE", 300))
+
+PUBLIC_CACHE_CONTROL = f"public, max-age={HTTP_MAX_AGE}, stale-while-revalidate={HTTP_STALE_WHILE_REVALIDATE}"
+# Per-user or per-token responses: stored by the browser only, always revalidated
+PRIVATE_CACHE_CONTROL = "private, no-cache"
+
+# Content codings the compression middleware can apply, see encoded_etag
+CONTENT_ENCODINGS = ("br", "gzip")
+
+
+class CacheEntry:
+    __slots__ = ("body", "headers", "version", "expires_at")
+
+    def __init__(self, body, headers, version, expires_at):
+        self.body = body
+        self.headers = headers
+        self.version = version
+        self.expires_at = expires_at
+
+
+class ResponseCache:
+    """Bounded LRU/TTL cache of already-serialized response bodies.
+
+    Entries are tagged with the catalog version they were built from.
+    Writes call ``bump_version()`` and every older entry becomes a miss,
+    so no write has to know which keys it affects.
+
+    The ETag of a response is derived from the version too (see
+    ``validator``), so If-None-Match is answered before anything is loaded.
+    """
+
+    def __init__(self, max_entries=512, ttl_seconds=300.0, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.version = 0
+        # Names the sequence of versions: this process's own counter unless
+        # a shared catalog hands out versions for every worker of the host
+        self.scope = os.urandom(8).hex()
+        # Whether every change of the data moves the version (snapshot
+        # reads). Otherwise writes by other processes go unnoticed, and
+        # validators also change every TTL to bound how long they hold.
+        self.authoritative = False
+        self._clock = clock
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        if entry.version != self.version:
+            del self._entries[key]
+            self.invalidations += 1
+            self.misses += 1
+            return None
+
+        if entry.expires_at <= self._clock():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def set(self, key, body, headers=None, version=None, etag=None, store=True):
+        """Store ``body`` built from catalog ``version`` (the current one by default).
+
+        Pass the version read before loading: when a write bumped it in the
+        meantime the body may predate the write, so it is returned but not
+        stored. ``etag`` defaults to a hash of the body; with ``store`` off
+        the entry is only built.
+        """
+        version = self.version if version is None else version
+        headers = {**(headers or {}), "ETag": etag or etag_for(body)}
+        entry = CacheEntry(body, headers, version, self._clock() + self.ttl_seconds)
+        if not store or self.max_entries <= 0 or version != self.version:
+            return entry
+
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return entry
+
+    def bump_version(self):
+        """Invalidate every cached response after a catalog write"""
+        self.version += 1
+        return self.version
+
+    def validator(self, key, version=None):
+        """Strong ETag of the response for ``key`` at ``version`` (the current one by default)"""
+        version = self.version if version is None else version
+        tag = (self.scope, version, key)
+        if not self.authoritative:
+            tag += (int(self._clock() // self.ttl_seconds) if self.ttl_seconds > 0 else self._clock(),)
+        return '"' + hashlib.blake2b(repr(tag).encode(), digest_size=16).hexdigest() + '"'
+
+    def set_version(self, version):
+        """Adopt a catalog version published by another worker (shared catalog)"""
+        self.version = version
+        return version
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "version": self.version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+class SingleFlight:
+    """Merge identical concurrent loads into one call whose result every caller shares.
+
+    The first caller for a key starts ``load()`` as a task; callers arriving
+    while it runs await the same task instead of querying MongoDB again.
+    The task is shielded, so a client disconnecting does not cancel it for
+    the others, and it is forgotten once done: results are not kept (that is
+    the response cache's job) and errors reach every waiter of that flight.
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self.flights = 0
+        self.coalesced = 0
+        self.failures = 0
+
+    async def run(self, key, load):
+        task = self._flights.get(key)
+        if task is None:
+            task = asyncio.ensure_future(load())
+            self._flights[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+            self.flights += 1
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _finished(self, key, task):
+        if self._flights.get(key) is task:
+            del self._flights[key]
+        # Retrieve the exception even if every waiter went away
+        if not task.cancelled() and task.exception() is not None:
+            self.failures += 1
+
+    def stats(self):
+        requests = self.flights + self.coalesced
+        return {
+            "in_flight": len(self._flights),
+            "flights": self.flights,
+            "coalesced": self.coalesced,
+            "coalesced_ratio": round(self.coalesced / requests, 4) if requests else 0.0,
+            "failures": self.failures,
+        }
+
+
+def etag_for(body):
+    """Strong ETag: a hash of the exact response bytes"""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def encoded_etag(etag, encoding):
+    """Strong ETag of ``etag``'s body compressed with ``encoding``: other bytes, other tag"""
+    weak = etag.startswith("W/")
+    tag = etag.removeprefix("W/")
+    return ("W/" if weak else "") + tag[:-1] + "-" + encoding + '"'
+
+
+def _unencoded(tag):
+    for encoding in CONTENT_ENCODINGS:
+        suffix = "-" + encoding + '"'
+        if tag.endswith(suffix):
+            return tag[:-len(suffix)] + '"'
+    return tag
+
+
+def matching_etag(if_none_match, etag):
+    """Validator in an If-None-Match header value that matches ``etag``, or None.
+
+    Comparison is weak (RFC 9110), and a tag the compression middleware
+    derived from ``etag`` (see encoded_etag) matches it too, so a 304 can
+    echo the validator the client received with its compressed 200.
+    """
+    if not if_none_match:
+        return None
+    if if_none_match.strip() == "*":
+        return etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        tag = candidate.removeprefix("W/")
+        if tag == etag or _unencoded(tag) == etag:
+            return candidate
+    return None
+
+
+def etag_matches(if_none_match, etag):
+    """Whether an If-None-Match header value matches ``etag``"""
+    return matching_etag(if_none_match, etag) is not None
+
+
+def cache_key(route, **params):
+    """Build a cache key that does not depend on parameter order or unset values"""
+    return (route, tuple(sorted((name, value) for name, value in params.items() if value is not None)))
+
+
+attraction_cache = ResponseCache(
+    max_entries=int(os.environ.get("ATTRACTIONS_CACHE_MAX_ENTRIES", 512)),
+    ttl_seconds=float(os.environ.get("ATTRACTIONS_CACHE_TTL_SECONDS", 300)),
+)
+
+# Concurrent reads with the same key and catalog version share one query
+read_flights = SingleFlight()
@@ -0,0 +1,334 @@
+from bisect import bisect_right
+from cache import attraction_cache
+from facets import matches_filter
+from geo import GridIndex, parse_coordinates
+from pagination import SORTS, InvalidCursor, keyset_key, sort_key
+from search import SearchIndex
+from shared_catalog import shared_catalog
+from suggest import SuggestIndex, index_write
+from voice import VoiceIndex
+import asyncio
+import logging
+import numpy as np
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# "mongo": reads query MongoDB, the snapshot only backs search and nearby
+# "snapshot": every attraction read is served from the snapshot, which is
+# loaded at startup and swapped after writes or when polling sees a change
+READ_MODE = os.environ.get("ATTRACTIONS_READ_MODE", "mongo")
+SNAPSHOT_POLL_SECONDS = float(os.environ.get("ATTRACTIONS_SNAPSHOT_POLL_SECONDS", 5))
+
+if READ_MODE == "snapshot":
+    # Reads only see the snapshot, which changes only with the version
+    attraction_cache.authoritative = True
+if shared_catalog is not None:
+    # Versions are the host-wide generations, so every worker answers
+    # If-None-Match for tags issued by the others
+    attraction_cache.scope = shared_catalog.token
+
+
+class CatalogSnapshot:
+    """Active attractions loaded for one catalog version, plus derived indexes"""
+
+    def __init__(self, version, documents, marker=None, views=None):
+        self.version = version
+        self.loaded_at = time.monotonic()
+        # Latest (updated_at, id) in the collection when loaded, see poll_catalog
+        self.marker = marker
+        self._spatial_index = None
+        self._search_index = None
+        self._voice_index = None
+        if views is not None:
+            # Mapped from the shared catalog file, see shared_catalog.py
+            self.documents = views["documents"]
+            self.by_id = views["by_id"]
+            self.by_category = views["by_category"]
+            self.by_difficulty = views["by_difficulty"]
+            self.positions, self.lat, self.lon = views["positions"], views["lat"], views["lon"]
+            self._orders = dict(views["orders"])
+            self._search_index = SearchIndex.from_arrays(self.documents, **views["search"])
+            return
+
+        self.documents = documents
+        self.by_id = {document["id"]: document for document in documents}
+        self.by_category = {}
+        self.by_difficulty = {}
+        for position, document in enumerate(documents):
+            self.by_category.setdefault(document.get("category"), set()).add(position)
+            self.by_difficulty.setdefault(document.get("difficulty"), set()).add(position)
+        self._orders = {}
+
+        positions, lats, lons = [], [], []
+        for position, document in enumerate(documents):
+            location = document.get("location")
+            if location:
+                lon, lat = location["coordinates"]
+            else:
+                parsed = parse_coordinates(document.get("coordinates"))
+                if parsed is None:
+                    continue
+                lat, lon = parsed
+            positions.append(position)
+            lats.append(lat)
+            lons.append(lon)
+
+        # Rows of the coordinate arrays map back to documents through positions
+        self.positions = np.array(positions, dtype=np.int64)
+        self.lat = np.array(lats, dtype=np.float64)
+        self.lon = np.array(lons, dtype=np.float64)
+
+    @property
+    def spatial_index(self):
+        if self._spatial_index is None:
+            self._spatial_index = GridIndex(self.lat, self.lon)
+        return self._spatial_index
+
+    @property
+    def search_index(self):
+        if self._search_index is None:
+            self._search_index = SearchIndex(self.documents)
+        return self._search_index
+
+    @property
+    def voice_index(self):
+        if self._voice_index is None:
+            self._voice_index = VoiceIndex(self.documents)
+        return self._voice_index
+
+    def sort_key(self, sort, position):
+        document = self.documents[position]
+        return sort_key(sort, document.get(SORTS[sort][0]), document["id"])
+
+    def order(self, sort):
+        """Positions of every document in ``sort`` order"""
+        if sort not in self._orders:
+            self._orders[sort] = np.array(
+                sorted(range(len(self.documents)), key=lambda position: self.sort_key(sort, position)),
+                dtype=np.int64,
+            )
+        return self._orders[sort]
+
+    def select(self, query, sort=None, cursor=None):
+        """Documents matching a listing ``query``, in ``sort`` order after ``cursor``.
+
+        The category and difficulty indexes narrow the candidates before
+        the remaining conditions are evaluated.
+        """
+        allowed = None
+        for field, index in (("category", self.by_category), ("difficulty", self.by_difficulty)):
+            if isinstance(query.get(field), str):
+                positions = index.get(query[field], set())
+                allowed = positions if allowed is None else allowed & positions
+        if sort is None:
+            positions = sorted(allowed) if allowed is not None else range(len(self.documents))
+        else:
+            positions = self.order(sort)
+            if cursor:
+                try:
+                    start = bisect_right(positions, keyset_key(sort, cursor), key=lambda position: self.sort_key(sort, position))
+                    positions = positions[start:]
+                except TypeError:
+                    # Cursor value of another type than the sort field
+                    raise InvalidCursor("Malformed cursor")
+        for position in positions:
+            if allowed is not None and position not in allowed:
+                continue
+            document = self.documents[position]
+            if matches_filter(document, query):
+                yield document
+
+    def is_fresh(self):
+        if READ_MODE == "snapshot":
+            # Kept current by writes and poll_catalog, never by expiry;
+            # other workers' rebuilds show in the shared generation
+            return shared_catalog is None or self.version == shared_catalog.generation()
+        return (
+            self.version == attraction_cache.version
+            and time.monotonic() - self.loaded_at < attraction_cache.ttl_seconds
+        )
+
+
+_snapshot = None
+_lock = asyncio.Lock()
+
+
+async def get_catalog(db):
+    """Return the current snapshot, reloading it after writes or once the TTL expires.
+
+    The TTL bounds staleness for writes made by other worker processes. In
+    snapshot mode with a shared catalog, a new generation published by
+    another worker is mapped instead.
+    """
+    global _snapshot
+    if _snapshot is not None and _snapshot.is_fresh():
+        return _snapshot
+
+    async with _lock:
+        if _snapshot is None or not _snapshot.is_fresh():
+            if READ_MODE == "snapshot" and shared_catalog is not None:
+                if not _adopt():
+                    async with shared_catalog.locked():
+                        # Nothing published yet, unless a worker just did
+                        if not _adopt():
+                            await _rebuild(db)
+            else:
+                version = attraction_cache.version
+                marker, documents = await _load(db)
+                _snapshot = CatalogSnapshot(version, documents, marker)
+    return _snapshot
+
+
+def catalog_version():
+    """Catalog version the next read serves, before anything is loaded"""
+    if READ_MODE == "snapshot" and shared_catalog is not None:
+        # Possibly published by another worker and not mapped here yet
+        return shared_catalog.generation()
+    return attraction_cache.version
+
+
+async def latest_change(db):
+    """(updated_at, id) of the last write to the collection, from the updated_at_id index"""
+    cursor = db.attractions.find({}, {"_id": 0, "updated_at": 1, "id": 1})
+    latest = await cursor.sort([("updated_at", -1), ("id", -1)]).limit(1).to_list(1)
+    return (latest[0].get("updated_at"), latest[0].get("id")) if latest else None
+
+
+async def _load(db):
+    # Marker first: a write landing in between only causes one extra reload
+    marker = await latest_change(db)
+    documents = await db.attractions.find({"is_active": True}, {"_id": 0}).to_list(None)
+    return marker, documents
+
+
+def _adopt():
+    """Map the generation published in the shared catalog, False if there is none"""
+    global _snapshot
+    if _snapshot is not None and _snapshot.version == shared_catalog.generation():
+        return True
+    loaded = shared_catalog.load()
+    if loaded is None:
+        return False
+    generation, marker, views = loaded
+    _snapshot = CatalogSnapshot(attraction_cache.set_version(generation), None, marker, views)
+    return True
+
+
+async def _rebuild(db):
+    """Load a new snapshot and swap it in with a new catalog version.
+
+    Callers hold ``_lock``, and the shared catalog lock when there is one.
+    """
+    global _snapshot
+    marker, documents = await _load(db)
+    snapshot = CatalogSnapshot(None, documents, marker)
+    # No await from here on: the swap and the version move together
+    if shared_catalog is not None:
+        shared_catalog.publish(snapshot)
+        # Serve from the mapping like every other worker, not from the
+        # documents just loaded, so this process holds no private copy
+        _adopt()
+    else:
+        snapshot.version = attraction_cache.bump_version()
+        _snapshot = snapshot
+
+
+async def refresh_catalog(db):
+    """Rebuild the snapshot after a write, returning the new version.
+
+    Readers holding the previous snapshot finish with it; no reader sees a
+    partially built one.
+    """
+    async with _lock:
+        if shared_catalog is None:
+            await _rebuild(db)
+        else:
+            async with shared_catalog.locked():
+                await _rebuild(db)
+    return _snapshot.version
+
+
+async def sync_catalog(db, wait=True):
+    """Rebuild the snapshot if the collection changed since it was loaded.
+
+    With a shared catalog the newest published generation is mapped first,
+    so after another worker's rebuild this costs one marker query. Without
+    ``wait``, nothing happens while another worker holds the rebuild lock.
+    """
+    async with _lock:
+        if shared_catalog is None:
+            if _snapshot is None or await latest_change(db) != _snapshot.marker:
+                await _rebuild(db)
+            return
+        async with shared_catalog.locked(wait) as held:
+            if not held:
+                return
+            _adopt()
+            if _snapshot is None or await latest_change(db) != _snapshot.marker:
+                await _rebuild(db)
+
+
+async def publish_write(db):
+    """Move the catalog to a new version after a write, returning it"""
+    if READ_MODE == "snapshot":
+        return await refresh_catalog(db)
+    return attraction_cache.bump_version()
+
+
+async def poll_catalog(db, interval=SNAPSHOT_POLL_SECONDS):
+    """Swap in a new snapshot when another process wrote to the collection"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await sync_catalog(db, wait=False)
+        except Exception as e:
+            logger.warning(f"Catalog snapshot poll failed: {e}")
+
+
+def snapshot_stats():
+    """Summary of the current snapshot for the health endpoint"""
+    snapshot = _snapshot
+    return {
+        "mode": READ_MODE,
+        "version": snapshot.version if snapshot else None,
+        "documents": len(snapshot.documents) if snapshot else 0,
+        "age_seconds": round(time.monotonic() - snapshot.loaded_at, 1) if snapshot else None,
+        "shared": shared_catalog is not None,
+    }
+
+
+def warm_catalog():
+    """The current snapshot if it is loaded and fresh, without ever loading it"""
+    snapshot = _snapshot
+    return snapshot if snapshot is not None and snapshot.is_fresh() else None
+
+
+_suggest_index = None
+
+
+async def get_suggest_index(db):
+    """Typeahead index, built from the snapshot and then maintained by writes"""
+    global _suggest_index
+    index = _suggest_index
+    if (
+        index is None
+        or index.version != attraction_cache.version
+        or time.monotonic() - index.built_at >= attraction_cache.ttl_seconds
+    ):
+        catalog = await get_catalog(db)
+        index = SuggestIndex(catalog.documents, catalog.version)
+        _suggest_index = index
+    return index
+
+
+def apply_write(before, after, version):
+    """Fold a write made by this process into the incrementally maintained indexes.
+
+    ``version`` is the catalog version the write produced. Indexes that were
+    not current before the write are left alone and rebuilt on next use.
+    """
+    if _suggest_index is not None and _suggest_index.version == version - 1:
+        index_write(_suggest_index, before, after)
+        _suggest_index.version = version
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Command line tools for the Ecoexpedições API
+
+Usage (from the backend directory):
+    python cli.py indexes            # create/update the managed indexes
+    python cli.py indexes --check    # only report what is missing
+    python cli.py stats --rebuild    # recompute the materialized stats document
+    python cli.py bundle             # write the offline catalog bundle
+    python cli.py import FILE        # upsert attractions from an NDJSON file
+    python cli.py normalize --all    # recompute price_cents, duration_minutes, distance_km
+    python cli.py bench nearby       # nearby search benchmarks
+    python cli.py bench search       # full-text search benchmarks
+    python cli.py bench suggest      # typeahead latency percentiles
+    python cli.py bench voice        # voice command resolution latency
+    python cli.py bench serialize    # JSON encoding and compression of a listing page
+    python cli.py bench msgpack      # MessagePack vs JSON size and speed
+    python cli.py bench convert      # stored documents to response bytes
+"""
+
+from dotenv import load_dotenv
+from pathlib import Path
+import asyncio
+import os
+import sys
+import typer
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+from database import create_client
+from indexes import ensure_indexes, missing_route_indexes
+from stats import aggregate_stats, rebuild_materialized_stats
+from bundle import BUNDLE_DIR, write_bundle
+from bulk import BULK_CHUNK_SIZE, bulk_upsert
+from normalization import backfill_normalized
+from pymongo.errors import PyMongoError
+
+app = typer.Typer(help="Ferramentas de linha de comando da API Ecoexpedições")
+bench = typer.Typer(help="Benchmarks do caminho de leitura")
+app.add_typer(bench, name="bench")
+
+
+@app.callback()
+def main():
+    """Ecoexpedições API tools"""
+
+
+def run_with_db(operation):
+    """Run ``operation(db)`` on a short-lived client and return its result"""
+    async def runner():
+        client = create_client()
+        try:
+            return await operation(client[os.environ['DB_NAME']])
+        finally:
+            client.close()
+
+    return asyncio.run(runner())
+
+
+@app.command()
+def indexes(
+    check: bool = typer.Option(False, "--check", help="Only report missing indexes, do not build them"),
+    prune: bool = typer.Option(False, "--prune", help="Drop indexes that are not declared in indexes.py"),
+):
+    """Create, rebuild and report the MongoDB indexes used by the API"""
+    if not check:
+        report = run_with_db(lambda db: ensure_indexes(db, prune=prune))
+        for status in ("created", "rebuilt", "dropped", "unchanged", "unmanaged"):
+            for label in report[status]:
+                typer.echo(f"{status:>10}  {label}")
+        for duplicates in report["deduplicated"]:
+            typer.echo(f"{'deduped':>10}  {duplicates['index']}: {duplicates['removed']} removed")
+        for failure in report["failed"]:
+            typer.echo(f"{'failed':>10}  {failure['index']}: {failure['error']}", err=True)
+
+    missing = run_with_db(missing_route_indexes)
+    for route, labels in missing.items():
+        typer.echo(f"missing for {route}: {', '.join(labels)}", err=True)
+    if missing:
+        raise typer.Exit(code=1)
+    typer.echo("All route indexes are in place")
+
+
+@app.command()
+def stats(
+    rebuild: bool = typer.Option(False, "--rebuild", help="Rewrite the materialized stats document"),
+):
+    """Show attraction statistics computed by the $facet pipeline"""
+    if rebuild:
+        result = run_with_db(rebuild_materialized_stats)
+    else:
+        result = run_with_db(aggregate_stats)
+    for name, value in result.items():
+        typer.echo(f"{name}: {value}")
+
+
+@app.command("bundle")
+def bundle_command(
+    output: Path = typer.Option(BUNDLE_DIR, help="Directory for the bundle files and manifest"),
+    seed: bool = typer.Option(False, "--seed", help="Bundle data/initial_attractions.py instead of the database"),
+):
+    """Write the hashed, precompressed offline catalog bundle served at /api/attractions/bundle"""
+    documents = None
+    if not seed:
+        try:
+            documents = run_with_db(
+                lambda db: db.attractions.find({"is_active": True}, {"_id": 0}).to_list(None)
+            )
+        except (KeyError, PyMongoError) as e:
+            typer.echo(f"Database unavailable ({e!r}), bundling the initial attractions", err=True)
+    from_database = documents is not None
+    if not from_database:
+        from data.initial_attractions import get_initial_attractions
+        documents = get_initial_attractions()
+
+    manifest = write_bundle(documents, output, with_sync_token=from_database)
+    typer.echo(f"{manifest['file']}: {manifest['count']} attractions")
+    for encoding, size in manifest["sizes"].items():
+        typer.echo(f"{encoding:>10}  {size} bytes")
+
+
+async def read_chunks(file, size=1 << 20):
+    while chunk := file.read(size):
+        yield chunk
+
+
+@app.command("import")
+def import_command(
+    path: Path = typer.Argument(..., help="NDJSON file with one attraction per line, - for stdin"),
+    chunk_size: int = typer.Option(BULK_CHUNK_SIZE, help="Rows per bulk_write"),
+):
+    """Create or replace attractions from NDJSON, keyed on their id"""
+    async def upsert(db):
+        if str(path) == "-":
+            return await bulk_upsert(db, read_chunks(sys.stdin.buffer), chunk_size)
+        with open(path, "rb") as file:
+            return await bulk_upsert(db, read_chunks(file), chunk_size)
+
+    report = run_with_db(upsert)
+    for error in report["errors"]:
+        typer.echo(f"line {error['line']} ({error['id']}): {error['error']}", err=True)
+    typer.echo(
+        f"{report['received']} rows: {report['inserted']} inserted, {report['updated']} updated, "
+        f"{report['failed']} failed in {report['seconds']}s ({report['rows_per_second']} rows/s)"
+    )
+    if report["failed"]:
+        raise typer.Exit(code=1)
+
+
+@app.command()
+def normalize(
+    recompute: bool = typer.Option(False, "--all", help="Parse every attraction again, not only those missing the fields"),
+    batch_size: int = typer.Option(1000, help="Updates per bulk_write"),
+):
+    """Store the numeric price, duration and distance used by range filters"""
+    updated = run_with_db(lambda db: backfill_normalized(db, batch_size=batch_size, recompute=recompute))
+    typer.echo(f"Normalized {updated} attractions")
+
+
+def parse_sizes(sizes):
+    return [int(size) for size in sizes.split(",")]
+
+
+def print_rows(rows):
+    for row in rows:
+        typer.echo("  ".join(
+            f"{name}={value:.3f}" if isinstance(value, float) else f"{name}={value}"
+            for name, value in row.items()
+        ))
+
+
+@bench.command("nearby")
+def bench_nearby_command(
+    sizes: str = typer.Option("10000,100000", help="Comma separated catalog sizes"),
+    queries: int = typer.Option(200, help="Queries per measurement"),
+    mongo: bool = typer.Option(False, "--mongo", help="Also time $geoNear against MONGO_URL"),
+):
+    """Legacy loop vs NumPy scan vs grid index (and optionally $geoNear)"""
+    from benchmarks import bench_geo_near, bench_nearby
+
+    print_rows(bench_nearby(parse_sizes(sizes), queries=queries))
+    if mongo:
+        print_rows(run_with_db(lambda db: bench_geo_near(db, parse_sizes(sizes))))
+
+
+@bench.command("search")
+def bench_search_command(
+    sizes: str = typer.Option("6,1000,10000", help="Comma separated catalog sizes"),
+):
+    """Full-text index build and query latency"""
+    from benchmarks import bench_search
+
+    print_rows(bench_search(parse_sizes(sizes)))
+
+
+@bench.command("suggest")
+def bench_suggest_command(
+    sizes: str = typer.Option("6,1000,10000", help="Comma separated catalog sizes"),
+):
+    """Typeahead build time, p50/p99 lookup latency and upsert cost"""
+    from benchmarks import bench_suggest
+
+    print_rows(bench_suggest(parse_sizes(sizes)))
+
+
+@bench.command("voice")
+def bench_voice_command(
+    sizes: str = typer.Option("6,1000,10000", help="Comma separated catalog sizes"),
+):
+    """Voice index build time and per-transcript resolution latency"""
+    from benchmarks import bench_voice
+
+    print_rows(bench_voice(parse_sizes(sizes)))
+
+
+@bench.command("serialize")
+def bench_serialize_command(
+    sizes: str = typer.Option("100", help="Comma separated page sizes"),
+):
+    """Bytes and CPU of a listing page: stdlib json vs orjson, gzip and brotli"""
+    from benchmarks import bench_serialization
+
+    print_rows(bench_serialization(parse_sizes(sizes)))
+
+
+@bench.command("msgpack")
+def bench_msgpack_command(
+    sizes: str = typer.Option("10,100,1000", help="Comma separated page sizes"),
+):
+    """Body size and encode/decode time: JSON vs MessagePack"""
+    from benchmarks import bench_msgpack
+
+    print_rows(bench_msgpack(parse_sizes(sizes)))
+
+
+@bench.command("convert")
+def bench_convert_command(
+    sizes: str = typer.Option("100,1000", help="Comma separated page sizes"),
+):
+    """Stored documents to response bytes: Pydantic models vs the trusted converter"""
+    from benchmarks import bench_convert
+
+    print_rows(bench_convert(parse_sizes(sizes)))
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,113 @@
+from cache import encoded_etag
+from starlette.datastructures import Headers, MutableHeaders
+import gzip
+import os
+
+try:
+    import brotli
+except ImportError:  # only gzip is offered
+    brotli = None
+
+# Bodies smaller than this go out as they are: the framing overhead and the
+# CPU are not worth it for a few hundred bytes
+COMPRESSION_MIN_BYTES = int(os.environ.get("ATTRACTIONS_COMPRESSION_MIN_BYTES", 1024))
+
+# Fast levels: responses are compressed on every request. The offline
+# bundle, compressed once, uses the maximum levels instead.
+BROTLI_QUALITY = 4
+GZIP_LEVEL = 6
+
+COMPRESSIBLE_TYPES = ("application/json", "application/msgpack", "text/")
+
+
+def _choose_encoding(accept_encoding):
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        coding, _, parameters = part.strip().partition(";")
+        quality = 1.0
+        if parameters.strip().startswith("q="):
+            try:
+                quality = float(parameters.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip()] = quality
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class CompressionMiddleware:
+    """Brotli or gzip compression of response bodies above a size threshold.
+
+    Responses that already carry a Content-Encoding (the precompressed
+    catalog bundle) and streamed responses pass through untouched.
+    """
+
+    def __init__(self, app, minimum_size=COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = _choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        start = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, passthrough
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                content_type = headers.get("content-type", "")
+                passthrough = (
+                    "content-encoding" in headers
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)
+                )
+                if encoding is None and not passthrough:
+                    # Caches still need to know the body depends on the header
+                    MutableHeaders(raw=message["headers"]).add_vary_header("Accept-Encoding")
+                    passthrough = True
+                if passthrough:
+                    await send(message)
+                else:
+                    # Held back until the body shows whether to compress
+                    start = message
+                return
+
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            if message.get("more_body", False):
+                # Streaming response, send it as it comes
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            headers = MutableHeaders(raw=start["headers"])
+            if len(body) >= self.minimum_size:
+                body = compress(body, encoding)
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(body))
+                # Different bytes, so a different strong validator; it still
+                # matches the uncompressed body's tag in If-None-Match
+                etag = headers.get("etag")
+                if etag:
+                    headers["ETag"] = encoded_etag(etag, encoding)
+            headers.add_vary_header("Accept-Encoding")
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,100 @@
+from fastapi import Request
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import monitoring
+import os
+import threading
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """Keep running counters of connection pool events for /api/health"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {
+            "pools_created": 0,
+            "pools_cleared": 0,
+            "connections_created": 0,
+            "connections_closed": 0,
+            "checked_out": 0,
+            "checkout_failures": 0,
+        }
+
+    def _incr(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def pool_created(self, event):
+        self._incr("pools_created")
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._incr("pools_cleared")
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._incr("connections_created")
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._incr("connections_closed")
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self._incr("checkout_failures")
+
+    def connection_checked_out(self, event):
+        self._incr("checked_out")
+
+    def connection_checked_in(self, event):
+        self._incr("checked_out", -1)
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+        counters["open_connections"] = counters["connections_created"] - counters["connections_closed"]
+        return counters
+
+
+def _int_env(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def client_options():
+    """Build driver options from the environment (see .env.example)"""
+    options = {
+        "maxPoolSize": _int_env("MONGO_MAX_POOL_SIZE", 100),
+        "minPoolSize": _int_env("MONGO_MIN_POOL_SIZE", 0),
+        "maxIdleTimeMS": _int_env("MONGO_MAX_IDLE_TIME_MS", 60000),
+        "connectTimeoutMS": _int_env("MONGO_CONNECT_TIMEOUT_MS", 5000),
+        "serverSelectionTimeoutMS": _int_env("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000),
+        "socketTimeoutMS": _int_env("MONGO_SOCKET_TIMEOUT_MS", 20000),
+        "waitQueueTimeoutMS": _int_env("MONGO_WAIT_QUEUE_TIMEOUT_MS", 5000),
+    }
+    compressors = os.environ.get("MONGO_COMPRESSORS")
+    if compressors:
+        options["compressors"] = compressors
+    return options
+
+
+def create_client(pool_listener=None):
+    """Create the application-scoped Mongo client (one per process)"""
+    listeners = [pool_listener] if pool_listener else []
+    return AsyncIOMotorClient(
+        os.environ['MONGO_URL'],
+        event_listeners=listeners,
+        **client_options()
+    )
+
+
+def get_database(request: Request) -> AsyncIOMotorDatabase:
+    """FastAPI dependency returning the database bound to the shared client"""
+    return request.app.state.db
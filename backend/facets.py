@@ -0,0 +1,117 @@
+"""
+Facet counts for the filter chips of the listing
+
+``facets=category,difficulty,price_bucket`` adds to a listing page how
+many attractions each chip would show. Counts respect every active filter
+except the facet's own one, so the other categories stay visible (with
+their counts) while one category is selected.
+"""
+
+# Price buckets by lower bound in cents, labelled in reais
+PRICE_BUCKETS = ((50000, "500+"), (20000, "200-500"), (10000, "100-200"), (0, "0-100"))
+UNKNOWN_PRICE = "unknown"
+
+# Facet -> stored field it counts
+FACETS = {
+    "category": "category",
+    "difficulty": "difficulty",
+    "price_bucket": "price_cents",
+}
+
+
+class InvalidFacets(ValueError):
+    pass
+
+
+def parse_facets(facets):
+    """Requested facet names, in request order"""
+    requested = tuple(dict.fromkeys(name.strip() for name in facets.split(",") if name.strip()))
+    unknown = [name for name in requested if name not in FACETS]
+    if unknown:
+        raise InvalidFacets(f"Unknown facets: {', '.join(unknown)}, expected some of: {', '.join(FACETS)}")
+    return requested
+
+
+def price_bucket(price_cents):
+    if price_cents is None:
+        return UNKNOWN_PRICE
+    for lower, label in PRICE_BUCKETS:
+        if price_cents >= lower:
+            return label
+    return UNKNOWN_PRICE
+
+
+def owned_filters(query, facets):
+    """Split ``query`` into the filters shared by every count and those of each facet"""
+    common = dict(query)
+    owned = {}
+    for name in facets:
+        field = FACETS[name]
+        owned[name] = {field: common.pop(field)} if field in common else {}
+    return common, owned
+
+
+def _others(owned, name):
+    conditions = {}
+    for other, condition in owned.items():
+        if other != name:
+            conditions.update(condition)
+    return conditions
+
+
+def facet_stages(owned):
+    """$facet sub-pipelines grouping by each facet's field under the other facets' filters"""
+    stages = {}
+    for name in owned:
+        conditions = _others(owned, name)
+        stages[name] = ([{"$match": conditions}] if conditions else []) + [
+            {"$group": {"_id": f"${FACETS[name]}", "count": {"$sum": 1}}},
+        ]
+    return stages
+
+
+def _labelled(name, pairs):
+    counts = {}
+    for value, count in pairs:
+        label = price_bucket(value) if name == "price_bucket" else value
+        if label is not None:
+            counts[label] = counts.get(label, 0) + count
+    return dict(sorted(counts.items(), key=lambda item: (-item[1], str(item[0]))))
+
+
+def facet_counts(name, groups):
+    """Counts of one facet from its $facet output"""
+    return _labelled(name, ((group["_id"], group["count"]) for group in groups))
+
+
+def matches_filter(document, query):
+    """Evaluate a listing filter (equality, $gte, $lte) on an in-memory document"""
+    for field, condition in query.items():
+        value = document.get(field, True if field == "is_active" else None)
+        if isinstance(condition, dict):
+            if value is None:
+                return False
+            if "$gte" in condition and value < condition["$gte"]:
+                return False
+            if "$lte" in condition and value > condition["$lte"]:
+                return False
+        elif value != condition:
+            return False
+    return True
+
+
+def count_in_memory(documents, owned):
+    """Facet counts over documents already matching the common filters"""
+    counts = {}
+    for name in owned:
+        conditions = _others(owned, name)
+        field = FACETS[name]
+        counts[name] = _labelled(name, (
+            (document.get(field), 1) for document in documents if matches_filter(document, conditions)
+        ))
+    return counts
+
+
+def matches_owned(document, owned):
+    """Whether ``document`` passes every facet's own filter"""
+    return all(matches_filter(document, condition) for condition in owned.values())
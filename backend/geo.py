@@ -0,0 +1,231 @@
+from pymongo import UpdateOne
+import numpy as np
+import os
+
+# "mongo": $geoNear on the location_2dsphere index
+# "memory": grid index over the in-process catalog snapshot
+GEO_MODE = os.environ.get("ATTRACTIONS_GEO_MODE", "mongo")
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+
+
+def parse_coordinates(coordinates):
+    """Parse the stored ``"lat, lon"`` string, returning None when malformed"""
+    if not coordinates:
+        return None
+    parts = coordinates.split(",")
+    if len(parts) != 2:
+        return None
+    try:
+        lat, lon = float(parts[0].strip()), float(parts[1].strip())
+    except ValueError:
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None
+    return lat, lon
+
+
+def to_geojson_point(coordinates):
+    """GeoJSON point for the ``coordinates`` string (note the lon, lat order)"""
+    parsed = parse_coordinates(coordinates)
+    if parsed is None:
+        return None
+    lat, lon = parsed
+    return {"type": "Point", "coordinates": [lon, lat]}
+
+
+async def backfill_locations(db, batch_size=1000):
+    """Store a GeoJSON ``location`` on attractions that only have the string form"""
+    cursor = db.attractions.find(
+        {"location": {"$exists": False}, "coordinates": {"$type": "string"}},
+        {"_id": 1, "coordinates": 1}
+    )
+    updated = 0
+    batch = []
+    async for document in cursor:
+        point = to_geojson_point(document["coordinates"])
+        if point is None:
+            continue
+        batch.append(UpdateOne({"_id": document["_id"]}, {"$set": {"location": point}}))
+        if len(batch) >= batch_size:
+            updated += (await db.attractions.bulk_write(batch, ordered=False)).modified_count
+            batch = []
+    if batch:
+        updated += (await db.attractions.bulk_write(batch, ordered=False)).modified_count
+    return updated
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km; accepts scalars or NumPy arrays"""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class GridIndex:
+    """Fixed-size lat/lon grid over a coordinate array.
+
+    A radius query only looks at the cells overlapping the bounding box of
+    the search circle and runs the exact haversine on those candidates.
+    """
+
+    def __init__(self, lat, lon, cell_degrees=0.25):
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.cell_degrees = cell_degrees
+        self.cells = {}
+
+        if len(self.lat) == 0:
+            return
+
+        rows = np.floor(self.lat / cell_degrees).astype(np.int64)
+        cols = np.floor(self.lon / cell_degrees).astype(np.int64)
+        order = np.lexsort((cols, rows))
+        cell_keys = np.stack((rows[order], cols[order]), axis=1)
+        unique_keys, starts = np.unique(cell_keys, axis=0, return_index=True)
+        ends = np.append(starts[1:], len(order))
+        for (row, col), start, end in zip(unique_keys.tolist(), starts, ends):
+            self.cells[(row, col)] = order[start:end]
+
+    def __len__(self):
+        return len(self.lat)
+
+    def _candidates(self, lat, lon, radius_km):
+        dlat = radius_km / KM_PER_DEGREE
+        cos_lat = np.cos(np.radians(min(abs(lat) + dlat, 90.0)))
+        dlon = radius_km / (KM_PER_DEGREE * cos_lat) if cos_lat > 1e-9 else 360.0
+
+        if dlon >= 180 or abs(lon) + dlon > 180:
+            # Circle reaches a pole or crosses the antimeridian
+            return np.arange(len(self.lat))
+
+        row_min = int(np.floor((lat - dlat) / self.cell_degrees))
+        row_max = int(np.floor((lat + dlat) / self.cell_degrees))
+        col_min = int(np.floor((lon - dlon) / self.cell_degrees))
+        col_max = int(np.floor((lon + dlon) / self.cell_degrees))
+
+        if (row_max - row_min + 1) * (col_max - col_min + 1) > len(self.cells):
+            hits = [
+                indexes for (row, col), indexes in self.cells.items()
+                if row_min <= row <= row_max and col_min <= col <= col_max
+            ]
+        else:
+            hits = [
+                self.cells[(row, col)]
+                for row in range(row_min, row_max + 1)
+                for col in range(col_min, col_max + 1)
+                if (row, col) in self.cells
+            ]
+        return np.concatenate(hits) if hits else np.empty(0, dtype=np.int64)
+
+    def nearby(self, lat, lon, radius_km, limit):
+        """Return ``(positions, distances_km)`` sorted by distance"""
+        candidates = self._candidates(lat, lon, radius_km)
+        if len(candidates) == 0:
+            return candidates, np.empty(0)
+
+        distances = haversine_km(lat, lon, self.lat[candidates], self.lon[candidates])
+        inside = distances <= radius_km
+        candidates, distances = candidates[inside], distances[inside]
+
+        if len(candidates) > limit:
+            closest = np.argpartition(distances, limit - 1)[:limit]
+            candidates, distances = candidates[closest], distances[closest]
+        order = np.argsort(distances, kind="stable")
+        return candidates[order], distances[order]
+
+
+def decode_polyline(encoded, precision=5):
+    """Decode a Google encoded polyline into a list of (lat, lon) pairs"""
+    points = []
+    index = lat = lon = 0
+    factor = 10 ** precision
+    length = len(encoded)
+
+    while index < length:
+        deltas = []
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                if index >= length:
+                    raise ValueError("Truncated polyline")
+                byte = ord(encoded[index]) - 63
+                index += 1
+                result |= (byte & 0x1F) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]
+        lon += deltas[1]
+        points.append((lat / factor, lon / factor))
+    return points
+
+
+def corridor_match(lat, lon, route, width_km, chunk_elements=2_000_000):
+    """Find the points within ``width_km`` of a route polyline.
+
+    Points and route are projected once onto a local equirectangular plane
+    (accurate to well under 1% at corridor scale), then the distance from
+    every candidate point to every route segment is computed as one
+    vectorized operation per chunk of points.
+
+    Returns ``(rows, offsets_km, positions_km)``: the matching rows of the
+    coordinate arrays, their distance to the route and how far along the
+    route their closest point is, ordered by that position.
+    """
+    route = np.asarray(route, dtype=np.float64)
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    empty = (np.empty(0, dtype=np.int64), np.empty(0), np.empty(0))
+    if len(lat) == 0:
+        return empty
+
+    # Bounding box of the route grown by the corridor width
+    dlat = width_km / KM_PER_DEGREE
+    cos_lat = max(np.cos(np.radians(min(np.abs(route[:, 0]).max() + dlat, 90.0))), 1e-9)
+    dlon = width_km / (KM_PER_DEGREE * cos_lat)
+    rows = np.flatnonzero(
+        (lat >= route[:, 0].min() - dlat) & (lat <= route[:, 0].max() + dlat)
+        & (lon >= route[:, 1].min() - dlon) & (lon <= route[:, 1].max() + dlon)
+    )
+    if len(rows) == 0:
+        return empty
+
+    scale = np.radians(EARTH_RADIUS_KM)
+    cos_ref = np.cos(np.radians(route[:, 0].mean()))
+
+    def project(points_lat, points_lon):
+        return np.stack((points_lon * scale * cos_ref, points_lat * scale), axis=-1)
+
+    route_xy = project(route[:, 0], route[:, 1])
+    starts = route_xy[:-1]
+    segments = route_xy[1:] - starts
+    segment_lengths = np.hypot(segments[:, 0], segments[:, 1])
+    squared_lengths = np.where(segment_lengths > 0, segment_lengths ** 2, 1.0)
+    cumulative = np.concatenate(([0.0], np.cumsum(segment_lengths)[:-1]))
+
+    points_xy = project(lat[rows], lon[rows])
+    offsets = np.empty(len(rows))
+    positions = np.empty(len(rows))
+    step = max(1, chunk_elements // len(segments))
+
+    for start in range(0, len(rows), step):
+        chunk = points_xy[start:start + step]
+        relative = chunk[:, None, :] - starts[None, :, :]
+        t = np.clip((relative * segments[None, :, :]).sum(axis=2) / squared_lengths, 0.0, 1.0)
+        gaps = relative - t[:, :, None] * segments[None, :, :]
+        distances = np.hypot(gaps[:, :, 0], gaps[:, :, 1])
+        closest = distances.argmin(axis=1)
+        picked = np.arange(len(chunk))
+        offsets[start:start + step] = distances[picked, closest]
+        positions[start:start + step] = cumulative[closest] + t[picked, closest] * segment_lengths[closest]
+
+    inside = offsets <= width_km
+    rows, offsets, positions = rows[inside], offsets[inside], positions[inside]
+    order = np.argsort(positions, kind="stable")
+    return rows[order], offsets[order], positions[order]
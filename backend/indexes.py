@@ -0,0 +1,244 @@
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Every read route filters on is_active: True, so most attraction indexes
+# only need to cover active documents
+ACTIVE = {"is_active": True}
+
+# Indexes managed by this module, per collection. Names are part of the
+# contract: reconciliation matches existing indexes by name.
+INDEXES = {
+    "attractions": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        # Listing sort keys end with id so keyset pages can seek on them
+        IndexModel(
+            [("category", ASCENDING), ("rating", DESCENDING), ("id", ASCENDING)],
+            name="active_category_rating",
+            partialFilterExpression=ACTIVE,
+        ),
+        IndexModel(
+            [("difficulty", ASCENDING), ("rating", DESCENDING), ("id", ASCENDING)],
+            name="active_difficulty_rating",
+            partialFilterExpression=ACTIVE,
+        ),
+        IndexModel(
+            [("rating", DESCENDING), ("id", ASCENDING)],
+            name="active_rating",
+            partialFilterExpression=ACTIVE,
+        ),
+        IndexModel(
+            [("name", ASCENDING), ("id", ASCENDING)],
+            name="active_name",
+            partialFilterExpression=ACTIVE,
+        ),
+        # sort=price and the price_max/duration_max/distance_max filters
+        IndexModel(
+            [("price_cents", ASCENDING), ("id", ASCENDING)],
+            name="active_price",
+            partialFilterExpression=ACTIVE,
+        ),
+        IndexModel(
+            [("duration_minutes", ASCENDING), ("rating", DESCENDING)],
+            name="active_duration",
+            partialFilterExpression=ACTIVE,
+        ),
+        IndexModel(
+            [("distance_km", ASCENDING), ("rating", DESCENDING)],
+            name="active_distance",
+            partialFilterExpression=ACTIVE,
+        ),
+        # Delta sync order; covers soft-deleted attractions too
+        IndexModel([("updated_at", ASCENDING), ("id", ASCENDING)], name="updated_at_id"),
+        # $geoNear needs exactly one 2dsphere index; documents without a
+        # location are skipped by the index
+        IndexModel([("location", "2dsphere")], name="location_2dsphere"),
+    ],
+    "favorites": [
+        IndexModel(
+            [("user_id", ASCENDING), ("attraction_id", ASCENDING)],
+            name="user_attraction_unique",
+            unique=True,
+        ),
+    ],
+    "status_checks": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("timestamp", DESCENDING)], name="timestamp"),
+    ],
+}
+
+# Indexes each route relies on to avoid a collection scan
+ROUTE_INDEXES = {
+    "GET /api/attractions": [
+        ("attractions", "active_category_rating"),
+        ("attractions", "active_difficulty_rating"),
+        ("attractions", "active_rating"),
+        ("attractions", "active_name"),
+        ("attractions", "active_price"),
+        ("attractions", "active_duration"),
+        ("attractions", "active_distance"),
+    ],
+    "GET /api/attractions/stats": [("attractions", "active_rating")],
+    "GET /api/attractions/changes": [("attractions", "updated_at_id")],
+    "GET /api/attractions/nearby/{lat}/{lon}": [("attractions", "location_2dsphere")],
+    "GET /api/attractions/{attraction_id}": [("attractions", "id_unique")],
+    "PUT /api/attractions/{attraction_id}": [("attractions", "id_unique")],
+    "DELETE /api/attractions/{attraction_id}": [("attractions", "id_unique")],
+    "POST /api/attractions/favorites": [
+        ("attractions", "id_unique"),
+        ("favorites", "user_attraction_unique"),
+    ],
+    "GET /api/attractions/favorites/{user_id}": [
+        ("favorites", "user_attraction_unique"),
+        ("attractions", "id_unique"),
+    ],
+    "DELETE /api/attractions/favorites/{user_id}/{attraction_id}": [
+        ("favorites", "user_attraction_unique"),
+    ],
+}
+
+# Unique indexes declared after data could already break them: the fields
+# whose duplicates are removed before the index is built
+DEDUPLICATE = {
+    # add_favorite used to check then insert, which let concurrent requests through
+    "favorites.user_attraction_unique": ("user_id", "attraction_id"),
+}
+
+# Indexes a route relies on for correctness, not only for speed: the API
+# does not start without them
+REQUIRED_INDEXES = ("favorites.user_attraction_unique",)
+
+# Index options that change the meaning of an index; anything else reported
+# by the server (v, ns, 2dsphereIndexVersion...) is ignored when comparing
+_COMPARED_OPTIONS = ("unique", "sparse", "partialFilterExpression", "expireAfterSeconds")
+
+
+def _spec(key, options):
+    """Normalize an index definition so declared and existing ones compare equal"""
+    spec = {"key": [(field, direction) for field, direction in key]}
+    for option in _COMPARED_OPTIONS:
+        value = options.get(option)
+        if value not in (None, False):
+            spec[option] = value
+    return spec
+
+
+def _declared_spec(index):
+    document = dict(index.document)
+    return _spec(document.pop("key").items(), document)
+
+
+def _existing_spec(info):
+    # index_information() returns float directions for ascending/descending
+    key = [(field, int(direction) if isinstance(direction, (int, float)) else direction)
+           for field, direction in info["key"]]
+    return _spec(key, info)
+
+
+async def ensure_indexes(db, prune=False):
+    """Create missing indexes and rebuild the ones whose definition changed.
+
+    Safe to run on every startup: indexes that already match their
+    declaration are left alone. Indexes not declared here are only dropped
+    when ``prune`` is set.
+    """
+    report = {
+        "created": [], "rebuilt": [], "unchanged": [], "dropped": [], "unmanaged": [], "failed": [],
+        "deduplicated": [],
+    }
+
+    for collection_name, indexes in INDEXES.items():
+        collection = db[collection_name]
+        existing = await collection.index_information()
+        declared_names = {index.document["name"] for index in indexes}
+
+        for index in indexes:
+            name = index.document["name"]
+            label = f"{collection_name}.{name}"
+            wanted = _declared_spec(index)
+
+            try:
+                if name in existing and _existing_spec(existing[name]) == wanted:
+                    report["unchanged"].append(label)
+                    continue
+                if label in DEDUPLICATE:
+                    removed = await remove_duplicates(collection, DEDUPLICATE[label])
+                    if removed:
+                        logger.warning(f"Removed {removed} duplicate documents before building {label}")
+                        report["deduplicated"].append({"index": label, "removed": removed})
+                if name in existing:
+                    await collection.drop_index(name)
+                    await collection.create_indexes([index])
+                    report["rebuilt"].append(label)
+                else:
+                    await collection.create_indexes([index])
+                    report["created"].append(label)
+            except OperationFailure as e:
+                # e.g. duplicates preventing a unique index, or the same key
+                # already indexed under another name
+                logger.error(f"Could not build index {label}: {e}")
+                report["failed"].append({"index": label, "error": str(e)})
+
+        for name in existing:
+            if name == "_id_" or name in declared_names:
+                continue
+            label = f"{collection_name}.{name}"
+            if prune:
+                await collection.drop_index(name)
+                report["dropped"].append(label)
+            else:
+                report["unmanaged"].append(label)
+
+    return report
+
+
+async def remove_duplicates(collection, fields):
+    """Delete every document but the first inserted of each group sharing ``fields``"""
+    groups = collection.aggregate([
+        {"$sort": {"_id": 1}},
+        {"$group": {"_id": {field: f"${field}" for field in fields}, "ids": {"$push": "$_id"}}},
+        {"$match": {"ids.1": {"$exists": True}}},
+    ])
+    duplicates = [_id async for group in groups for _id in group["ids"][1:]]
+    if not duplicates:
+        return 0
+    return (await collection.delete_many({"_id": {"$in": duplicates}})).deleted_count
+
+
+async def missing_required_indexes(db):
+    """REQUIRED_INDEXES that do not exist or are outdated"""
+    outdated = await _outdated_indexes(db)
+    return [label for label in REQUIRED_INDEXES if label in outdated]
+
+
+async def _outdated_indexes(db):
+    existing = {}
+    for collection_name, indexes in INDEXES.items():
+        information = await db[collection_name].index_information()
+        existing[collection_name] = {
+            name: _existing_spec(info) for name, info in information.items()
+        }
+
+    return {
+        f"{collection_name}.{index.document['name']}"
+        for collection_name, indexes in INDEXES.items()
+        for index in indexes
+        if existing[collection_name].get(index.document["name"]) != _declared_spec(index)
+    }
+
+
+async def missing_route_indexes(db):
+    """Return, per route, the indexes it needs that do not exist or are outdated"""
+    outdated = await _outdated_indexes(db)
+    missing = {}
+    for route, required in ROUTE_INDEXES.items():
+        absent = [
+            f"{collection_name}.{name}"
+            for collection_name, name in required
+            if f"{collection_name}.{name}" in outdated
+        ]
+        if absent:
+            missing[route] = absent
+    return missing
@@ -1,8 +1,14 @@
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel, ConfigDict, Field, PlainSerializer
+from typing import Annotated, Dict, List, Optional, Union
 from datetime import datetime
 import uuid
 
+def utc_isoformat(value):
+    """Stored datetimes are naive UTC, mark them as such like the orjson responses do"""
+    return value.isoformat() + "Z" if value.tzinfo is None else value.isoformat()
+
+UTCDateTime = Annotated[datetime, PlainSerializer(utc_isoformat, when_used="json")]
+
 class Attraction(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     name: str
@@ -20,14 +26,91 @@ class Attraction(BaseModel):
     tips: List[str]
     category: str  # "Gruta" | "Rio" | "Cachoeira" | "Ecoturismo" | "Aventura" | "Balneário" | "Mergulho"
     price: str
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    # Numeric copies of price, duration and distance, see normalization.py
+    price_cents: Optional[int] = None
+    duration_minutes: Optional[int] = None
+    distance_km: Optional[float] = None
+    created_at: UTCDateTime = Field(default_factory=datetime.utcnow)
+    updated_at: UTCDateTime = Field(default_factory=datetime.utcnow)
     is_active: bool = True
 
-    class Config:
-        allow_population_by_field_name = True
+    # Stored documents use full_description, API payloads fullDescription
+    model_config = ConfigDict(populate_by_name=True)
+
+class AttractionCard(BaseModel):
+    """Fields of ``view=card``, what list cards render"""
+    id: str
+    name: str
+    image: str
+    rating: float
+    category: str
+    distance: str
+
+class NearbyAttractionCard(AttractionCard):
+    calculated_distance: float
+
+class NearbyAttraction(Attraction):
+    calculated_distance: float  # km from the requested point
+
+class AttractionChanges(BaseModel):
+    upserted: List[Attraction]  # created or updated, replace the local copy
+    deleted: List[str]  # ids of soft-deleted attractions to drop
+    next_token: str  # pass as ``since`` on the next sync
+    has_more: bool  # more changes are waiting, sync again right away
+
+class RouteAttraction(Attraction):
+    distance_from_route_km: float
+    route_position_km: float  # distance along the route to the closest point
+
+class RouteCorridorQuery(BaseModel):
+    polyline: Optional[str] = None  # Google encoded polyline (precision 5)
+    coordinates: Optional[List[List[float]]] = None  # [[lat, lon], ...]
+    width_km: float = Field(2, gt=0, le=50)  # maximum distance from the route
+    limit: int = Field(50, ge=1, le=200)
+
+class FacetedAttractions(BaseModel):
+    """Listing page requested with ``facets=``"""
+    attractions: Union[List[Attraction], List[AttractionCard]]
+    facets: Dict[str, Dict[str, int]]  # facet -> value -> count under the other filters
+
+class AttractionBatchQuery(BaseModel):
+    ids: List[str] = Field(..., min_length=1, max_length=500)
+    view: Optional[str] = Field(None, pattern="^(card|detail)$")
+    fields: Optional[str] = Field(None, max_length=300)
+
+class AttractionBatch(BaseModel):
+    attractions: Union[List[Attraction], List[AttractionCard]]  # in request order
+    missing: List[str]  # requested ids that do not exist or were deleted
+
+class SearchHit(BaseModel):
+    id: str
+    name: str
+    image: str
+    category: str
+    rating: float
+    score: float
+    snippet: str  # HTML-escaped excerpt, matches wrapped in <mark>
+
+class Suggestion(BaseModel):
+    type: str  # "attraction" | "category" | "activity"
+    id: Optional[str] = None  # attraction id, only for type "attraction"
+    label: str
+
+class VoiceCommand(BaseModel):
+    transcript: str = Field(min_length=1, max_length=500)  # raw speech recognition output
+
+class VoiceResolution(BaseModel):
+    # "navigate" | "open_attraction" | "nearby" | "category" | "home" |
+    # "favorites" | "recommended" | "all" | "help" | "unknown"
+    intent: str
+    attraction_id: Optional[str] = None
+    attraction_name: Optional[str] = None
+    category: Optional[str] = None
+    confidence: float  # 0-1, how well the transcript matched the target
 
 class AttractionCreate(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
     name: str
     image: str
     photos: List[str] = []
@@ -44,7 +127,28 @@ class AttractionCreate(BaseModel):
     category: str
     price: str
 
+class AttractionImport(AttractionCreate):
+    """One NDJSON row of a bulk import, upserted by ``id``"""
+    id: str = Field(min_length=1)
+    is_active: bool = True
+
+class BulkImportError(BaseModel):
+    line: int  # 1-based line number in the NDJSON body
+    id: Optional[str] = None
+    error: str
+
+class BulkImportReport(BaseModel):
+    received: int  # non-blank lines read
+    inserted: int
+    updated: int  # existing attractions overwritten
+    failed: int
+    errors: List[BulkImportError]  # the first failures, up to BULK_MAX_REPORTED_ERRORS
+    seconds: float
+    rows_per_second: float
+
 class AttractionUpdate(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
     name: Optional[str] = None
     image: Optional[str] = None
     photos: Optional[List[str]] = None
@@ -67,7 +171,9 @@ class AttractionFilter(BaseModel):
     difficulty: Optional[str] = None
     rating_min: Optional[float] = Field(None, ge=0, le=5)
     rating_max: Optional[float] = Field(None, ge=0, le=5)
-    price_max: Optional[float] = None
+    price_max: Optional[float] = None  # reais
+    duration_max: Optional[int] = None  # minutes
+    distance_max: Optional[float] = None  # km
     search: Optional[str] = None
     limit: int = Field(50, ge=1, le=100)
     skip: int = Field(0, ge=0)
@@ -76,7 +182,7 @@ class UserFavorite(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     user_id: str  # For future user authentication
     attraction_id: str
-    created_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: UTCDateTime = Field(default_factory=datetime.utcnow)
 
 class UserFavoriteCreate(BaseModel):
     user_id: str
@@ -0,0 +1,142 @@
+"""
+Numeric copies of the display strings, for range filters and sorts
+
+``price`` ("R$ 75,00"), ``duration`` ("1h 30min") and ``distance``
+("20 km") are written for people. Next to them every attraction stores
+``price_cents``, ``duration_minutes`` and ``distance_km``, which MongoDB
+can index, compare and sort. A string that cannot be read leaves its
+number null, and range filters never match it.
+"""
+
+from datetime import datetime
+from pymongo import UpdateOne
+from search import fold
+import re
+
+# Display string -> numeric field derived from it
+NORMALIZED_FIELDS = {
+    "price": "price_cents",
+    "duration": "duration_minutes",
+    "distance": "distance_km",
+}
+
+# "1.250,50", "75,00", "75": Brazilian thousands and decimal separators;
+# "75.50" (a point before one or two digits) is read as decimals too
+_MONEY = re.compile(r"(\d{1,3}(?:\.\d{3})+(?!\d)|\d+)(?:[,.](\d{1,2})(?!\d))?")
+_CURRENCY = "R$"
+_HOURS = re.compile(r"(\d+(?:[.,]\d+)?)\s*(?:h\b|hs\b|hrs?\b|horas?\b|h(?=\s*\d))")
+_MINUTES = re.compile(r"(\d+)\s*(?:min|minutos?)\b")
+# "1h30": minutes written after the hours without a unit
+_HOURS_MINUTES = re.compile(r"(\d+)\s*h\s*(\d{1,2})\b(?!\s*(?:h|min))")
+_DISTANCE = re.compile(r"(\d+(?:[.,]\d+)?)\s*(km|quilometros?|m|metros?)\b")
+_FREE = ("gratis", "gratuit", "free")
+
+
+def _number(text):
+    return float(text.replace(",", "."))
+
+
+def parse_price_cents(price):
+    """Cents of the amount in ``price``, 0 when it says free.
+
+    The first number after "R$" when there is one ("2 x R$ 50,00" is 50
+    reais), else the first number.
+    """
+    if not price:
+        return None
+    currency = price.find(_CURRENCY)
+    match = _MONEY.search(price, currency + len(_CURRENCY) if currency >= 0 else 0)
+    if match is None:
+        return 0 if any(word in fold(price) for word in _FREE) else None
+    reais = int(match.group(1).replace(".", ""))
+    cents = int((match.group(2) or "0").ljust(2, "0"))
+    return reais * 100 + cents
+
+
+def parse_duration_minutes(duration):
+    """Minutes of the first duration in ``duration`` ("1h 30min", "1h30", "45 min", "2 horas")"""
+    if not duration:
+        return None
+    text = fold(duration)
+    match = _HOURS_MINUTES.search(text)
+    if match:
+        return int(match.group(1)) * 60 + int(match.group(2))
+    hours = _HOURS.search(text)
+    minutes = _MINUTES.search(text)
+    if hours is None and minutes is None:
+        return None
+    total = _number(hours.group(1)) * 60 if hours else 0
+    if minutes and (hours is None or minutes.start() > hours.start()):
+        total += int(minutes.group(1))
+    return round(total)
+
+
+def parse_distance_km(distance):
+    """Kilometres of the first distance in ``distance`` ("20 km", "1,5 km", "800 m")"""
+    if not distance:
+        return None
+    match = _DISTANCE.search(fold(distance))
+    if match is None:
+        return None
+    value = _number(match.group(1))
+    return value if match.group(2).startswith(("km", "q")) else value / 1000
+
+
+_PARSERS = {
+    "price_cents": parse_price_cents,
+    "duration_minutes": parse_duration_minutes,
+    "distance_km": parse_distance_km,
+}
+
+
+def normalized_fields(document):
+    """Numeric fields for the display strings present in ``document``"""
+    return {
+        target: _PARSERS[target](document[source])
+        for source, target in NORMALIZED_FIELDS.items()
+        if source in document
+    }
+
+
+def range_filter(price_max=None, duration_max=None, distance_max=None):
+    """Mongo conditions for the listing's upper bounds (price in reais)"""
+    conditions = {}
+    if price_max is not None:
+        conditions["price_cents"] = {"$lte": round(price_max * 100)}
+    if duration_max is not None:
+        conditions["duration_minutes"] = {"$lte": duration_max}
+    if distance_max is not None:
+        conditions["distance_km"] = {"$lte": distance_max}
+    return conditions
+
+
+async def backfill_normalized(db, batch_size=1000, recompute=False):
+    """Store the numeric fields on attractions written before they existed.
+
+    With ``recompute`` every attraction is parsed again (after a parser
+    change). Only documents whose values change are written, and their
+    updated_at moves so offline clients receive the new fields.
+    """
+    query = {} if recompute else {"$or": [{target: {"$exists": False}} for target in _PARSERS]}
+    projection = {"_id": 1, **{source: 1 for source in NORMALIZED_FIELDS}, **{target: 1 for target in _PARSERS}}
+    updated = 0
+    batch = []
+    async for document in db.attractions.find(query, projection):
+        values = {target: _PARSERS[target](document.get(source)) for source, target in NORMALIZED_FIELDS.items()}
+        if all(target in document and document[target] == value for target, value in values.items()):
+            continue
+        batch.append((document["_id"], values))
+        if len(batch) >= batch_size:
+            updated += await _write_normalized(db, batch)
+            batch = []
+    if batch:
+        updated += await _write_normalized(db, batch)
+    return updated
+
+
+async def _write_normalized(db, batch):
+    # Stamped per batch as it is written, so sync tokens handed out during a
+    # long backfill never get ahead of rows committed after them
+    now = datetime.utcnow()
+    operations = [UpdateOne({"_id": _id}, {"$set": {**values, "updated_at": now}}) for _id, values in batch]
+    return (await db.attractions.bulk_write(operations, ordered=False)).modified_count
@@ -0,0 +1,103 @@
+import base64
+import binascii
+import json
+
+# Sort orders available to the listing: field, direction. Every order ends
+# with ``id`` ascending so the key is unique and pages never overlap.
+SORTS = {
+    "rating": ("rating", -1),
+    "name": ("name", 1),
+    # Attractions without a readable price (null) come first
+    "price": ("price_cents", 1),
+}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(payload):
+    """Opaque, URL-safe token for ``payload``"""
+    raw = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json.loads(raw)
+    except (binascii.Error, ValueError):
+        raise InvalidCursor("Malformed cursor")
+    if not isinstance(payload, dict):
+        raise InvalidCursor("Malformed cursor")
+    return payload
+
+
+def sort_spec(sort):
+    """Mongo sort for ``sort``: the sort field, then id"""
+    field, direction = SORTS[sort]
+    return [(field, direction), ("id", 1)]
+
+
+def keyset_cursor(sort, document):
+    """Cursor pointing just after ``document`` in ``sort`` order"""
+    field, _ = SORTS[sort]
+    return encode_cursor({"s": sort, "k": [document.get(field), document["id"]]})
+
+
+def _keyset(sort, token):
+    payload = decode_cursor(token)
+    key = payload.get("k")
+    if payload.get("s") != sort or not isinstance(key, list) or len(key) != 2:
+        raise InvalidCursor(f"Cursor does not belong to sort '{sort}'")
+    return key
+
+
+def keyset_filter(sort, token):
+    """Mongo filter selecting the documents after the cursor ``token``"""
+    field, direction = SORTS[sort]
+    value, last_id = _keyset(sort, token)
+    conditions = [{field: value, "id": {"$gt": last_id}}]
+    # Nulls sort before every value, and comparisons never match them
+    if value is None:
+        if direction == 1:
+            conditions.append({field: {"$ne": None}})
+    else:
+        conditions.append({field: {"$gt" if direction == 1 else "$lt": value}})
+        if direction == -1:
+            conditions.append({field: None})
+    return {"$or": conditions}
+
+
+def sort_key(sort, value, attraction_id):
+    """Python key ordering documents like the Mongo ``sort_spec``.
+
+    Nulls come first ascending and last descending. Descending sorts are
+    on numbers only.
+    """
+    _, direction = SORTS[sort]
+    if value is None:
+        return (0 if direction == 1 else 1, 0, attraction_id)
+    return (1 if direction == 1 else 0, value if direction == 1 else -value, attraction_id)
+
+
+def keyset_key(sort, token):
+    """``sort_key`` of the document the cursor ``token`` points after"""
+    value, last_id = _keyset(sort, token)
+    try:
+        return sort_key(sort, value, last_id)
+    except TypeError:
+        raise InvalidCursor("Malformed cursor")
+
+
+def offset_cursor(sort, offset):
+    """Cursor for result lists ranked in memory, where an offset is free"""
+    return encode_cursor({"s": sort, "o": offset})
+
+
+def cursor_offset(sort, token):
+    payload = decode_cursor(token)
+    offset = payload.get("o")
+    if payload.get("s") != sort or not isinstance(offset, int) or offset < 0:
+        raise InvalidCursor(f"Cursor does not belong to sort '{sort}'")
+    return offset
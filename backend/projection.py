@@ -0,0 +1,47 @@
+"""
+Sparse fieldsets for attraction responses
+
+``view=card`` returns what the list cards of the PWA render; ``view=detail``
+(the default) returns whole attractions. ``fields=`` picks fields by name and
+takes precedence over ``view``. The id is always returned.
+"""
+
+from serialization import RESPONSE_NAMES
+
+# Response name or stored name -> stored name
+_STORED_NAMES = {**{name: name for name in RESPONSE_NAMES}, **{name: stored for stored, name in RESPONSE_NAMES.items()}}
+
+VIEWS = {
+    "card": ("id", "name", "image", "rating", "category", "distance"),
+    "detail": None,
+}
+
+
+class InvalidFields(ValueError):
+    pass
+
+
+def resolve_fields(view=None, fields=None):
+    """Stored field names to return, or None for whole attractions"""
+    if fields:
+        requested = [name.strip() for name in fields.split(",") if name.strip()]
+        unknown = [name for name in requested if name not in _STORED_NAMES]
+        if unknown:
+            raise InvalidFields(f"Unknown fields: {', '.join(unknown)}")
+        return tuple(dict.fromkeys(["id"] + [_STORED_NAMES[name] for name in requested]))
+    if view:
+        if view not in VIEWS:
+            raise InvalidFields(f"Unknown view '{view}', expected one of: {', '.join(VIEWS)}")
+        return VIEWS[view]
+    return None
+
+
+def mongo_projection(fields, extra=()):
+    """Projection reading only ``fields`` (plus ``extra``, e.g. a sort key)"""
+    projection = {"_id": 0}
+    for name in (*fields, *extra):
+        projection[name] = 1
+        if name == "full_description":
+            # Older documents store the camelCase name
+            projection["fullDescription"] = 1
+    return projection
@@ -0,0 +1,230 @@
+from bisect import bisect_left
+from collections import defaultdict
+from functools import lru_cache
+import heapq
+import html
+import math
+import numpy as np
+import re
+import unicodedata
+
+# Field weights for BM25F-style scoring
+FIELD_WEIGHTS = {
+    "name": 3.0,
+    "category": 2.0,
+    "activities": 2.0,
+    "description": 1.5,
+    "full_description": 1.0,
+}
+
+# Fields snippets are cut from, in order of preference
+SNIPPET_FIELDS = ("description", "full_description")
+
+STOPWORDS = frozenset("""
+a ao aos as com da das de do dos e em na nas no nos o os ou para pela pelas
+pelo pelos por que se sem um uma umas uns
+""".split())
+
+# Checked longest first; the remaining stem must keep at least 3 letters
+_SUFFIXES = sorted("""
+amente mente acoes icoes ucoes acao icao ucao ismos ismo istas ista idades idade
+ezas eza ancias ancia encias encia aveis avel iveis ivel osas osos osa oso
+adoras adores adora ador antes ante zinhas zinhos zinha zinho inhas inhos inha
+inho issimas issimos issima issimo ando endo indo aram eram iram ar er ir
+""".split(), key=len, reverse=True)
+
+_WORD = re.compile(r"\w+")
+
+K1 = 1.2
+B = 0.75
+
+
+def fold(text):
+    """Lowercase and strip accents: "Cachoeíra" -> "cachoeira" """
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+@lru_cache(maxsize=65536)
+def stem(token):
+    """Light Portuguese stemmer for folded tokens.
+
+    Handles plurals, gender, diminutives and a few derivational suffixes.
+    It is deliberately conservative: documents and queries go through the
+    same function, so it only has to be consistent, not linguistically exact.
+    """
+    if len(token) <= 3 or token.isdigit():
+        return token
+
+    # Plural forms
+    if token.endswith("oes") or token.endswith("aes"):
+        token = token[:-3] + "ao"
+    elif token.endswith("ais") or token.endswith("ois") or token.endswith("uis"):
+        token = token[:-2] + "l"
+    elif token.endswith("eis") and len(token) > 4:
+        token = token[:-3] + "el"
+    elif token.endswith("ns"):
+        token = token[:-2] + "m"
+    elif token.endswith("res") or token.endswith("zes") or token.endswith("les"):
+        token = token[:-2]
+    elif token.endswith("s") and not token.endswith("ss"):
+        token = token[:-1]
+
+    for suffix in _SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            token = token[:-len(suffix)]
+            break
+
+    # Gender and thematic vowel
+    if len(token) > 4 and token[-1] in "aoe":
+        token = token[:-1]
+    return token
+
+
+@lru_cache(maxsize=65536)
+def _word_term(word):
+    return stem(fold(word))
+
+
+def analyze(text):
+    """Folded, stemmed tokens of ``text`` without stopwords"""
+    return [stem(token) for token in _WORD.findall(fold(text)) if token not in STOPWORDS]
+
+
+def _field_text(document, field):
+    value = document.get(field) or ""
+    if field == "full_description" and not value:
+        value = document.get("fullDescription") or ""
+    return " ".join(value) if isinstance(value, list) else value
+
+
+class SearchIndex:
+    """In-process inverted index over the catalog with BM25F ranking.
+
+    Postings are stored as flat arrays (term ``t`` owns
+    ``positions[offsets[t]:offsets[t + 1]]`` and the matching ``weights``),
+    so a shared catalog can map them instead of rebuilding them, see
+    ``from_arrays``.
+    """
+
+    def __init__(self, documents):
+        postings = defaultdict(dict)  # term -> {position: weighted tf}
+        lengths = []
+        for position, document in enumerate(documents):
+            length = 0.0
+            for field, weight in FIELD_WEIGHTS.items():
+                terms = analyze(_field_text(document, field))
+                length += weight * len(terms)
+                for term in terms:
+                    term_postings = postings[term]
+                    term_postings[position] = term_postings.get(position, 0.0) + weight
+            lengths.append(length)
+
+        average_length = (sum(lengths) / len(lengths) if lengths else 0.0) or 1.0
+        terms = sorted(postings)
+        count = len(documents)
+        self._set(
+            documents,
+            terms,
+            offsets=np.cumsum([0] + [len(postings[term]) for term in terms], dtype=np.int64),
+            positions=np.fromiter((p for term in terms for p in postings[term]), dtype=np.int64),
+            weights=np.fromiter((w for term in terms for w in postings[term].values()), dtype=np.float64),
+            idf=np.array([
+                math.log(1 + (count - len(postings[term]) + 0.5) / (len(postings[term]) + 0.5))
+                for term in terms
+            ], dtype=np.float64),
+            # Per-document BM25 length normalization, computed once
+            norms=np.array([K1 * (1 - B + B * length / average_length) for length in lengths], dtype=np.float64),
+        )
+
+    @classmethod
+    def from_arrays(cls, documents, terms, offsets, positions, weights, idf, norms):
+        """Index over arrays built earlier (``terms`` is any sorted sequence of str)"""
+        index = cls.__new__(cls)
+        index._set(documents, terms, offsets, positions, weights, idf, norms)
+        return index
+
+    def _set(self, documents, terms, offsets, positions, weights, idf, norms):
+        self.documents = documents
+        self.terms = terms
+        self.offsets = offsets
+        self.positions = positions
+        self.weights = weights
+        self.idf = idf
+        self.norms = norms
+
+    def _expand(self, term):
+        """Index of the exact term if indexed, otherwise of every indexed term it prefixes"""
+        start = bisect_left(self.terms, term)
+        matches = []
+        for index in range(start, min(start + 50, len(self.terms))):
+            candidate = self.terms[index]
+            if candidate == term:
+                return [index]
+            if not candidate.startswith(term):
+                break
+            matches.append(index)
+        return matches
+
+    def search(self, query, limit=None):
+        """Return ``[(position, score), ...]`` best first"""
+        scores = defaultdict(float)
+        for query_term in dict.fromkeys(analyze(query)):
+            for term in self._expand(query_term):
+                start, end = self.offsets[term], self.offsets[term + 1]
+                positions = self.positions[start:end]
+                frequencies = self.weights[start:end]
+                idf = self.idf[term] * (K1 + 1)
+                contributions = idf * frequencies / (frequencies + self.norms[positions])
+                for position, contribution in zip(positions.tolist(), contributions.tolist()):
+                    scores[position] += contribution
+
+        if limit:
+            return heapq.nsmallest(limit, scores.items(), key=_rank)
+        return sorted(scores.items(), key=_rank)
+
+    def snippet(self, position, query, width=24):
+        """Short excerpt around the first match with matches wrapped in <mark>"""
+        wanted = set()
+        for query_term in analyze(query):
+            wanted.update(self.terms[index] for index in self._expand(query_term))
+
+        document = self.documents[position]
+        fallback = None
+        for field in SNIPPET_FIELDS:
+            text = _field_text(document, field)
+            words = list(_WORD.finditer(text))
+            if fallback is None and words:
+                fallback = (text, words)
+            hits = [index for index, word in enumerate(words) if _word_term(word.group()) in wanted]
+            if hits:
+                return _highlight(text, words, set(hits), max(0, hits[0] - width // 3), width)
+
+        if fallback is None:
+            return ""
+        text, words = fallback
+        return _highlight(text, words, set(), 0, width)
+
+
+def _rank(item):
+    position, score = item
+    return -score, position
+
+
+def _highlight(text, words, hits, first, width):
+    last = min(len(words), first + width)
+    parts = ["…"] if first > 0 else []
+    cursor = words[first].start()
+    for index in range(first, last):
+        word = words[index]
+        parts.append(html.escape(text[cursor:word.start()]))
+        if index in hits:
+            parts.append(f"<mark>{html.escape(word.group())}</mark>")
+        else:
+            parts.append(html.escape(word.group()))
+        cursor = word.end()
+    if last < len(words):
+        parts.append("…")
+    else:
+        parts.append(html.escape(text[cursor:]))
+    return "".join(parts).strip()
@@ -0,0 +1,95 @@
+from datetime import datetime
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse
+from models import Attraction, utc_isoformat
+from pydantic import BaseModel
+import msgpack
+import orjson
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+# Older clients still send the unregistered name
+_MSGPACK_ALIASES = (MSGPACK, "application/x-msgpack")
+
+# Stored field name -> response name, in Attraction field order
+RESPONSE_NAMES = {name: field.alias or name for name, field in Attraction.model_fields.items()}
+ATTRACTION_FIELDS = tuple(RESPONSE_NAMES)
+
+# Datetimes from MongoDB are naive UTC; say so in the output ("...Z") instead
+# of leaving clients to guess the timezone
+ORJSON_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z
+
+
+def _default(value):
+    if isinstance(value, BaseModel):
+        return value.model_dump(by_alias=True)
+    # Anything else orjson does not know (ObjectId, Decimal, sets...)
+    return jsonable_encoder(value)
+
+
+def to_response(document, fields=ATTRACTION_FIELDS, extra=()):
+    """Response dict of a stored attraction, without model validation.
+
+    Documents come from our own collection, written through validated
+    models, so the read path only renames and selects fields. ``extra``
+    are computed fields copied as they are (``calculated_distance``...).
+    Documents written by older code may hold ``fullDescription`` instead
+    of ``full_description``; both are read.
+    """
+    response = {}
+    for name in fields:
+        value = document.get(name)
+        if value is None and name == "full_description":
+            value = document.get("fullDescription")
+        response[RESPONSE_NAMES[name]] = value
+    for name in extra:
+        response[name] = document.get(name)
+    return response
+
+
+def json_bytes(payload):
+    """Serialize a response payload (dicts, lists, models) to JSON bytes"""
+    return orjson.dumps(payload, default=_default, option=ORJSON_OPTIONS)
+
+
+def _msgpack_default(value):
+    if isinstance(value, datetime):
+        # Same strings as the JSON responses, so both formats share one schema
+        return utc_isoformat(value)
+    return _default(value)
+
+
+def msgpack_bytes(payload):
+    """Serialize a response payload to MessagePack with the JSON field names and types"""
+    return msgpack.packb(payload, default=_msgpack_default, use_bin_type=True, datetime=False)
+
+
+def negotiate(accept):
+    """Media type to answer an Accept header with: MessagePack if preferred, else JSON"""
+    qualities = {}
+    for part in (accept or "").lower().split(","):
+        media_type, _, parameters = part.strip().partition(";")
+        quality = 1.0
+        for parameter in parameters.split(";"):
+            name, _, value = parameter.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[media_type.strip()] = quality
+
+    msgpack_quality = max(qualities.get(alias, 0.0) for alias in _MSGPACK_ALIASES)
+    json_quality = max(qualities.get(JSON, 0.0), qualities.get("application/*", 0.0), qualities.get("*/*", 0.0))
+    return MSGPACK if msgpack_quality > 0 and msgpack_quality >= json_quality else JSON
+
+
+def encode(payload, media_type):
+    return msgpack_bytes(payload) if media_type == MSGPACK else json_bytes(payload)
+
+
+class JSONResponse(ORJSONResponse):
+    """Default response class of the app, rendered by orjson"""
+
+    def render(self, content):
+        return json_bytes(content)
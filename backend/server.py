@@ -1,7 +1,9 @@
-from fastapi import FastAPI, APIRouter
+from fastapi import FastAPI, APIRouter, Depends, Request
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from contextlib import asynccontextmanager
+import asyncio
 import os
 import logging
 from pathlib import Path
@@ -10,22 +12,61 @@ from typing import List
 import uuid
 from datetime import datetime
 
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
 # Import attraction routes
 from attractions_routes import router as attractions_router
+from voice_routes import router as voice_router
+from database import PoolStatsListener, create_client, get_database
+from indexes import ensure_indexes, missing_required_indexes, missing_route_indexes
+from cache import attraction_cache, read_flights
+from catalog import READ_MODE, poll_catalog, snapshot_stats, sync_catalog
+from stats import STATS_MODE, rebuild_materialized_stats
+from geo import backfill_locations
+from normalization import backfill_normalized
+from models import UTCDateTime
+from serialization import JSONResponse
+from compression import CompressionMiddleware
 
-ROOT_DIR = Path(__file__).parent
-load_dotenv(ROOT_DIR / '.env')
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the shared MongoDB client, seed data and close the client on shutdown"""
+    logger.info("Starting up Ecoexpedições API...")
+    
+    # MongoDB connection shared by every request of this process
+    app.state.pool_stats = PoolStatsListener()
+    app.state.mongo_client = create_client(app.state.pool_stats)
+    app.state.db = app.state.mongo_client[os.environ['DB_NAME']]
+    
+    await startup_event(app.state.db)
+    poller = None
+    if READ_MODE == "snapshot":
+        # Reads are served from memory from the first request on; with a
+        # shared catalog only the first worker to start loads it from MongoDB
+        await sync_catalog(app.state.db)
+        poller = asyncio.create_task(poll_catalog(app.state.db))
+    try:
+        yield
+    finally:
+        if poller is not None:
+            poller.cancel()
+        app.state.mongo_client.close()
 
 # Create the main app without a prefix
 app = FastAPI(
     title="Ecoexpedições API",
     description="API para guia turístico de Bonito, MS - PWA Android Auto",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=JSONResponse
 )
 
 # Create a router with the /api prefix
@@ -35,7 +76,7 @@ api_router = APIRouter(prefix="/api")
 class StatusCheck(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     client_name: str
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
+    timestamp: UTCDateTime = Field(default_factory=datetime.utcnow)
 
 class StatusCheckCreate(BaseModel):
     client_name: str
@@ -48,42 +89,50 @@ async def root():
         "version": "1.0.0",
         "endpoints": [
             "/api/attractions - Tourist attractions",
+            "/api/voice/resolve - Voice command resolution",
             "/api/status - System status",
             "/api/docs - API documentation"
         ]
     }
 
 @api_router.post("/status", response_model=StatusCheck)
-async def create_status_check(input: StatusCheckCreate):
+async def create_status_check(input: StatusCheckCreate, db: AsyncIOMotorDatabase = Depends(get_database)):
     status_dict = input.dict()
     status_obj = StatusCheck(**status_dict)
     _ = await db.status_checks.insert_one(status_obj.dict())
     return status_obj
 
 @api_router.get("/status", response_model=List[StatusCheck])
-async def get_status_checks():
+async def get_status_checks(db: AsyncIOMotorDatabase = Depends(get_database)):
     status_checks = await db.status_checks.find().to_list(1000)
     return [StatusCheck(**status_check) for status_check in status_checks]
 
 @api_router.get("/health")
-async def health_check():
+async def health_check(request: Request):
     """Health check endpoint for PWA and monitoring"""
+    pool = request.app.state.pool_stats.stats()
     try:
         # Test database connection
-        await client.admin.command('ping')
-        return {
+        await request.app.state.mongo_client.admin.command('ping')
+        # Returned as a response so orjson, not jsonable_encoder, formats the timestamp
+        return JSONResponse({
             "status": "healthy",
             "timestamp": datetime.utcnow(),
             "database": "connected",
+            "pool": pool,
+            "cache": attraction_cache.stats(),
+            "coalescing": read_flights.stats(),
+            "catalog": snapshot_stats(),
             "version": "1.0.0"
-        }
+        })
     except Exception as e:
-        return {
+        return JSONResponse({
             "status": "unhealthy",
             "timestamp": datetime.utcnow(),
             "database": "disconnected",
+            "pool": pool,
             "error": str(e)
-        }
+        })
 
 # Include the main API router
 app.include_router(api_router)
@@ -91,38 +140,66 @@ app.include_router(api_router)
 # Include attractions routes
 app.include_router(attractions_router)
 
+# Include voice command routes
+app.include_router(voice_router)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    # Pagination and caching metadata of the attraction reads
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "ETag", "X-Catalog-Version"],
 )
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
+# brotli/gzip for responses above ATTRACTIONS_COMPRESSION_MIN_BYTES
+app.add_middleware(CompressionMiddleware)
 
-@app.on_event("startup")
-async def startup_event():
+async def startup_event(db):
     """Initialize database and populate with sample data if empty"""
-    logger.info("Starting up Ecoexpedições API...")
-    
     # Check if attractions collection exists and has data
     attractions_count = await db.attractions.count_documents({})
     
     if attractions_count == 0:
         logger.info("Populating database with initial attractions data...")
-        await populate_initial_data()
+        await populate_initial_data(db)
+    
+    # GeoJSON points for documents written before nearby search used them
+    located = await backfill_locations(db)
+    if located:
+        logger.info(f"Added GeoJSON location to {located} attractions")
+    
+    # price_cents, duration_minutes and distance_km for range filters
+    normalized = await backfill_normalized(db)
+    if normalized:
+        logger.info(f"Normalized price, duration and distance of {normalized} attractions")
+    
+    await bootstrap_indexes(db)
+    
+    if STATS_MODE == "materialized":
+        # Start from exact counters; writes keep them current from here on
+        await rebuild_materialized_stats(db)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
+async def bootstrap_indexes(db):
+    """Reconcile the managed indexes and warn about routes left without one"""
+    try:
+        report = await ensure_indexes(db)
+        if report["created"] or report["rebuilt"]:
+            logger.info(f"Indexes created: {report['created']}, rebuilt: {report['rebuilt']}")
+        
+        for route, indexes in (await missing_route_indexes(db)).items():
+            logger.warning(f"Route {route} is missing indexes: {indexes}")
+    except Exception as e:
+        logger.error(f"Error bootstrapping indexes: {e}")
+        # Continue startup, queries still work without indexes
+    
+    # ...except the ones that reject duplicates (see REQUIRED_INDEXES)
+    missing = await missing_required_indexes(db)
+    if missing:
+        raise RuntimeError(f"Required indexes could not be built: {', '.join(missing)}")
 
-async def populate_initial_data():
+async def populate_initial_data(db):
     """Populate database with initial attractions data"""
     from data.initial_attractions import get_initial_attractions
     
@@ -0,0 +1,318 @@
+"""
+Catalog snapshot shared by the uvicorn workers of one host
+
+With ATTRACTIONS_SHARED_CATALOG_DIR set (snapshot read mode), the worker
+that needs a new snapshot (after its own write, or when its poll sees one
+made elsewhere) takes a file lock, loads the catalog from MongoDB once and
+writes it to ``catalog.bin``, then increments the generation counter in
+``catalog.gen``. Every worker, the one that wrote it included, compares
+that counter on each read and maps the new file when it moved, without
+querying MongoDB.
+
+Everything a read needs lives in the mapping: each document as its own
+MessagePack record behind an offset table, decoded when a request touches
+it; the id and category lookups; the coordinate and sort order arrays; and
+the postings of the full-text index. The pages are shared by every worker,
+so the catalog costs its size once per host rather than once per worker.
+Only the voice and typeahead indexes, which hold names and categories, are
+still built per worker.
+
+Put the directory on a tmpfs (``/dev/shm/...``) so the pages stay in
+memory.
+"""
+
+from bisect import bisect_left
+from collections.abc import Mapping, Sequence
+from contextlib import asynccontextmanager
+from datetime import datetime
+from pagination import SORTS
+from pathlib import Path
+import asyncio
+import fcntl
+import mmap
+import msgpack
+import numpy as np
+import os
+import struct
+
+SHARED_CATALOG_DIR = os.environ.get("ATTRACTIONS_SHARED_CATALOG_DIR")
+
+DATA_NAME = "catalog.bin"
+GENERATION_NAME = "catalog.gen"
+LOCK_NAME = "catalog.lock"
+
+MAGIC = b"ECOCAT2\0"
+# magic, generation, offset and length of the MessagePack table of contents
+HEADER = struct.Struct("<8sQQQ")
+GENERATION = struct.Struct("<Q")
+# Random name of this host's catalog, after the generation in catalog.gen:
+# generations of another host (or a recreated directory) never match it
+TOKEN_SIZE = 16
+
+# Fields with a position index, see CatalogSnapshot.select
+GROUPED_FIELDS = ("category", "difficulty")
+
+_DATETIME = 1
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return msgpack.ExtType(_DATETIME, value.isoformat().encode("ascii"))
+    raise TypeError(f"Cannot store {type(value).__name__} in the shared catalog")
+
+
+def _ext_hook(code, data):
+    if code == _DATETIME:
+        return datetime.fromisoformat(data.decode("ascii"))
+    return msgpack.ExtType(code, data)
+
+
+def _pack(value):
+    return msgpack.packb(value, default=_default, use_bin_type=True)
+
+
+def _unpack(data):
+    return msgpack.unpackb(data, ext_hook=_ext_hook, raw=False)
+
+
+def _text(data):
+    return str(data, "utf-8")
+
+
+class PackedSequence(Sequence):
+    """Records stored back to back, record i in ``data[offsets[i]:offsets[i + 1]]``, decoded on access"""
+
+    def __init__(self, offsets, data, decode):
+        self._offsets = offsets
+        self._data = data
+        self._decode = decode
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("record index out of range")
+        return self._decode(self._data[int(self._offsets[index]):int(self._offsets[index + 1])])
+
+
+class PackedLookup(Mapping):
+    """id -> document, by binary search over the sorted ids"""
+
+    def __init__(self, ids, positions, documents):
+        self._ids = ids
+        self._positions = positions
+        self._documents = documents
+
+    def _find(self, key):
+        index = bisect_left(self._ids, key)
+        if index < len(self._ids) and self._ids[index] == key:
+            return int(self._positions[index])
+        return None
+
+    def __getitem__(self, key):
+        position = self._find(key)
+        if position is None:
+            raise KeyError(key)
+        return self._documents[position]
+
+    def __contains__(self, key):
+        return isinstance(key, str) and self._find(key) is not None
+
+    def __iter__(self):
+        return iter(self._ids)
+
+    def __len__(self):
+        return len(self._ids)
+
+
+class PackedGroups(Mapping):
+    """Field value -> set of positions, sliced from one array grouped by value"""
+
+    def __init__(self, ranges, positions):
+        self._ranges = ranges
+        self._positions = positions
+
+    def __getitem__(self, value):
+        start, end = self._ranges[value]
+        return set(self._positions[start:end].tolist())
+
+    def __iter__(self):
+        return iter(self._ranges)
+
+    def __len__(self):
+        return len(self._ranges)
+
+
+def _packed_records(records):
+    """(offsets, data) of already encoded records"""
+    offsets = np.cumsum([0] + [len(record) for record in records], dtype=np.int64)
+    return offsets, b"".join(records)
+
+
+def _sections(snapshot):
+    """Named arrays and byte blobs of ``snapshot``, plus the group ranges"""
+    documents = snapshot.documents
+    sections = {
+        "positions": np.asarray(snapshot.positions, dtype=np.int64),
+        "lat": np.asarray(snapshot.lat, dtype=np.float64),
+        "lon": np.asarray(snapshot.lon, dtype=np.float64),
+        **{f"order:{sort}": np.asarray(snapshot.order(sort), dtype=np.int64) for sort in SORTS},
+    }
+    sections["documents.offsets"], sections["documents.data"] = _packed_records([_pack(document) for document in documents])
+
+    by_id = sorted(range(len(documents)), key=lambda position: documents[position]["id"])
+    sections["ids.positions"] = np.array(by_id, dtype=np.int64)
+    sections["ids.offsets"], sections["ids.data"] = _packed_records(
+        [documents[position]["id"].encode("utf-8") for position in by_id]
+    )
+
+    groups = {}
+    for field in GROUPED_FIELDS:
+        values = {}
+        for position, document in enumerate(documents):
+            values.setdefault(document.get(field), []).append(position)
+        ranges, positions = [], []
+        for value, members in values.items():
+            ranges.append([value, len(positions), len(positions) + len(members)])
+            positions.extend(members)
+        groups[field] = ranges
+        sections[f"group:{field}"] = np.array(positions, dtype=np.int64)
+
+    index = snapshot.search_index
+    sections["search.terms.offsets"], sections["search.terms.data"] = _packed_records(
+        [term.encode("utf-8") for term in index.terms]
+    )
+    for name in ("offsets", "positions", "weights", "idf", "norms"):
+        sections[f"search.{name}"] = np.asarray(getattr(index, name))
+    return sections, groups
+
+
+class SharedCatalog:
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock_file = open(self.directory / LOCK_NAME, "a+b")
+        path = self.directory / GENERATION_NAME
+        size = GENERATION.size + TOKEN_SIZE
+        # The first worker to start names the catalog, under the rebuild lock
+        fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            with open(path, "a+b") as file:
+                if os.fstat(file.fileno()).st_size < size:
+                    file.truncate(size)
+            with open(path, "r+b") as file:
+                self._generation = mmap.mmap(file.fileno(), size)
+            if not any(self._generation[GENERATION.size:]):
+                self._generation[GENERATION.size:] = os.urandom(TOKEN_SIZE)
+        finally:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+        self.token = self._generation[GENERATION.size:].hex()
+
+    def generation(self):
+        """Current generation, 0 before the first publish"""
+        return GENERATION.unpack_from(self._generation)[0]
+
+    @asynccontextmanager
+    async def locked(self, wait=True):
+        """Hold the rebuild lock, yielding False if ``wait`` is off and another process has it"""
+        flags = fcntl.LOCK_EX if wait else fcntl.LOCK_EX | fcntl.LOCK_NB
+        try:
+            # Waiting for another worker's rebuild must not block this event loop
+            await asyncio.to_thread(fcntl.flock, self._lock_file.fileno(), flags)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    def publish(self, snapshot):
+        """Write ``snapshot`` and move to the next generation (hold the lock)"""
+        generation = self.generation() + 1
+        sections, groups = _sections(snapshot)
+        contents = {}
+        temporary = self.directory / (DATA_NAME + ".tmp")
+        with open(temporary, "wb") as file:
+            file.write(bytes(HEADER.size))
+            for name, section in sections.items():
+                # Aligned so the arrays can be viewed in place
+                file.write(bytes(-file.tell() % 8))
+                if isinstance(section, np.ndarray):
+                    contents[name] = [file.tell(), section.dtype.str, len(section)]
+                    file.write(np.ascontiguousarray(section).tobytes())
+                else:
+                    contents[name] = [file.tell(), None, len(section)]
+                    file.write(section)
+            table = _pack({
+                "marker": snapshot.marker,
+                "count": len(snapshot.documents),
+                "sections": contents,
+                "groups": groups,
+            })
+            table_offset = file.tell()
+            file.write(table)
+            file.seek(0)
+            file.write(HEADER.pack(MAGIC, generation, table_offset, len(table)))
+        # Workers still reading the previous file keep their mapping of it
+        os.replace(temporary, self.directory / DATA_NAME)
+        GENERATION.pack_into(self._generation, 0, generation)
+        return generation
+
+    def load(self):
+        """``(generation, marker, views)`` of the published catalog, or None.
+
+        ``views`` holds the documents, lookups and arrays CatalogSnapshot
+        serves reads from, all backed by the mapping.
+        """
+        try:
+            file = open(self.directory / DATA_NAME, "rb")
+        except FileNotFoundError:
+            return None
+        with file:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, generation, table_offset, table_length = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            return None
+        table = _unpack(data[table_offset:table_offset + table_length])
+        buffer = memoryview(data)
+
+        sections = {}
+        for name, (offset, dtype, length) in table["sections"].items():
+            if dtype is None:
+                sections[name] = buffer[offset:offset + length]
+            else:
+                # Views on the mapping: no copy, and the pages are shared by every worker
+                sections[name] = np.frombuffer(data, dtype=dtype, count=length, offset=offset)
+
+        documents = PackedSequence(sections["documents.offsets"], sections["documents.data"], _unpack)
+        ids = PackedSequence(sections["ids.offsets"], sections["ids.data"], _text)
+        views = {
+            "documents": documents,
+            "by_id": PackedLookup(ids, sections["ids.positions"], documents),
+            **{
+                f"by_{field}": PackedGroups(
+                    {value: (start, end) for value, start, end in table["groups"][field]},
+                    sections[f"group:{field}"],
+                )
+                for field in GROUPED_FIELDS
+            },
+            "positions": sections["positions"],
+            "lat": sections["lat"],
+            "lon": sections["lon"],
+            "orders": {sort: sections[f"order:{sort}"] for sort in SORTS},
+            "search": {
+                "terms": PackedSequence(sections["search.terms.offsets"], sections["search.terms.data"], _text),
+                **{name: sections[f"search.{name}"] for name in ("offsets", "positions", "weights", "idf", "norms")},
+            },
+        }
+        marker = tuple(table["marker"]) if table["marker"] else None
+        return generation, marker, views
+
+
+shared_catalog = SharedCatalog(SHARED_CATALOG_DIR) if SHARED_CATALOG_DIR else None
@@ -0,0 +1,153 @@
+from models import AttractionStats
+from datetime import datetime
+import os
+
+# "facet": one $facet aggregation per (uncached) request
+# "materialized": read a counters document kept up to date by attraction writes
+STATS_MODE = os.environ.get("ATTRACTIONS_STATS_MODE", "facet")
+
+STATS_DOCUMENT_ID = "attractions"
+MOST_POPULAR_LIMIT = 5
+
+STATS_PIPELINE = [
+    {"$match": {"is_active": True}},
+    {"$facet": {
+        "totals": [
+            {"$group": {
+                "_id": None,
+                "total": {"$sum": 1},
+                "rating_sum": {"$sum": "$rating"},
+                "avg_rating": {"$avg": "$rating"},
+            }}
+        ],
+        "by_category": [{"$group": {"_id": "$category", "count": {"$sum": 1}}}],
+        "by_difficulty": [{"$group": {"_id": "$difficulty", "count": {"$sum": 1}}}],
+        "most_popular": [
+            {"$sort": {"rating": -1, "id": 1}},
+            {"$limit": MOST_POPULAR_LIMIT},
+            {"$project": {"_id": 0, "name": 1}},
+        ],
+    }},
+]
+
+# Fields the materialized counters depend on
+STATS_FIELDS = {"_id": 0, "is_active": 1, "category": 1, "difficulty": 1, "rating": 1}
+
+
+async def aggregate_stats(db):
+    """Compute every statistic in a single round trip"""
+    result = await db.attractions.aggregate(STATS_PIPELINE).to_list(1)
+    facets = result[0] if result else {}
+    totals = facets.get("totals") or [{"total": 0, "rating_sum": 0, "avg_rating": 0}]
+    return {
+        "total": totals[0]["total"],
+        "rating_sum": totals[0]["rating_sum"],
+        "avg_rating": totals[0]["avg_rating"] or 0,
+        "by_category": {doc["_id"]: doc["count"] for doc in facets.get("by_category", [])},
+        "by_difficulty": {doc["_id"]: doc["count"] for doc in facets.get("by_difficulty", [])},
+        "most_popular": [doc["name"] for doc in facets.get("most_popular", [])],
+    }
+
+
+async def rebuild_materialized_stats(db):
+    """Recompute the counters document from scratch (startup, CLI, bulk loads)"""
+    stats = await aggregate_stats(db)
+    document = {
+        "total": stats["total"],
+        "rating_sum": stats["rating_sum"],
+        "by_category": stats["by_category"],
+        "by_difficulty": stats["by_difficulty"],
+        "most_popular": stats["most_popular"],
+        "updated_at": datetime.utcnow(),
+    }
+    await db.attraction_stats.replace_one({"_id": STATS_DOCUMENT_ID}, document, upsert=True)
+    return document
+
+
+def _contribution(attraction):
+    """Counters a single attraction adds to the materialized document"""
+    if not attraction or not attraction.get("is_active", True):
+        return {}
+    return {
+        "total": 1,
+        "rating_sum": attraction.get("rating") or 0,
+        f"by_category.{attraction['category']}": 1,
+        f"by_difficulty.{attraction['difficulty']}": 1,
+    }
+
+
+async def record_change(db, before, after):
+    """Apply the difference between two versions of an attraction to the counters.
+
+    ``before`` is None for inserts; soft deletes pass ``after`` with
+    ``is_active`` False. Category and difficulty names become field paths,
+    so they must not contain dots.
+    """
+    if STATS_MODE != "materialized":
+        return
+
+    increments = {}
+    for field, amount in _contribution(after).items():
+        increments[field] = increments.get(field, 0) + amount
+    for field, amount in _contribution(before).items():
+        increments[field] = increments.get(field, 0) - amount
+    increments = {field: amount for field, amount in increments.items() if amount}
+
+    # Top rated list is cheap to recompute from the active_rating index
+    popular_cursor = db.attractions.find(
+        {"is_active": True}, {"_id": 0, "name": 1}
+    ).sort([("rating", -1), ("id", 1)]).limit(MOST_POPULAR_LIMIT)
+    most_popular = [attr["name"] for attr in await popular_cursor.to_list(MOST_POPULAR_LIMIT)]
+
+    update = {"$set": {"most_popular": most_popular, "updated_at": datetime.utcnow()}}
+    if increments:
+        update["$inc"] = increments
+    result = await db.attraction_stats.update_one({"_id": STATS_DOCUMENT_ID}, update)
+    if result.matched_count == 0:
+        await rebuild_materialized_stats(db)
+
+
+def stats_from_documents(documents):
+    """AttractionStats of in-memory active attractions (snapshot read mode)"""
+    by_category, by_difficulty = {}, {}
+    rating_sum = 0
+    for document in documents:
+        by_category[document["category"]] = by_category.get(document["category"], 0) + 1
+        by_difficulty[document["difficulty"]] = by_difficulty.get(document["difficulty"], 0) + 1
+        rating_sum += document.get("rating") or 0
+    popular = sorted(documents, key=lambda document: (-(document.get("rating") or 0), document["id"]))
+    return AttractionStats(
+        total_attractions=len(documents),
+        by_category=dict(sorted(by_category.items())),
+        by_difficulty=dict(sorted(by_difficulty.items())),
+        average_rating=round(rating_sum / len(documents), 2) if documents else 0,
+        most_popular=[document["name"] for document in popular[:MOST_POPULAR_LIMIT]]
+    )
+
+
+async def load_stats(db):
+    """Return AttractionStats using the configured engine"""
+    if STATS_MODE == "materialized":
+        document = await db.attraction_stats.find_one({"_id": STATS_DOCUMENT_ID})
+        if document is None:
+            document = await rebuild_materialized_stats(db)
+        total = document["total"]
+        average = document["rating_sum"] / total if total else 0
+        by_category = {name: count for name, count in document["by_category"].items() if count}
+        by_difficulty = {name: count for name, count in document["by_difficulty"].items() if count}
+        most_popular = document["most_popular"]
+    else:
+        stats = await aggregate_stats(db)
+        total = stats["total"]
+        average = stats["avg_rating"]
+        by_category = stats["by_category"]
+        by_difficulty = stats["by_difficulty"]
+        most_popular = stats["most_popular"]
+
+    return AttractionStats(
+        total_attractions=total,
+        by_category=by_category,
+        by_difficulty=by_difficulty,
+        average_rating=round(average, 2),
+        most_popular=most_popular
+    )
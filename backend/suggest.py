@@ -0,0 +1,146 @@
+from bisect import bisect_left
+from search import STOPWORDS, fold
+import re
+import time
+
+_WORD = re.compile(r"\w+")
+
+# Lower sorts first among matches of the same prefix
+KIND_PRIORITY = {"attraction": 0, "category": 1, "activity": 2}
+# Matches on a later word of a name ("azul" in "Gruta do Lago Azul") rank
+# after matches on its beginning
+WORD_MATCH_PENALTY = 3
+
+MAX_SCANNED = 256
+
+
+def _name_keys(name):
+    """Folded name plus every suffix starting at a significant word"""
+    folded = " ".join(_WORD.findall(fold(name)))
+    words = folded.split(" ")
+    keys = [(folded, 0)]
+    for index in range(1, len(words)):
+        if words[index] not in STOPWORDS:
+            keys.append((" ".join(words[index:]), WORD_MATCH_PENALTY))
+    return keys
+
+
+class SuggestIndex:
+    """Sorted array of folded keys for typeahead prefix lookups.
+
+    Attraction names are indexed under each significant word; categories
+    and activities are shared between attractions and reference counted.
+    Writes update the arrays in place instead of rebuilding them.
+    """
+
+    def __init__(self, documents=(), version=0):
+        self.version = version
+        self.built_at = time.monotonic()
+        self._keys = []
+        self._entries = []
+        self._by_attraction = {}
+        self._shared = {}
+
+        pending = []
+        for document in documents:
+            pending.extend(self._entries_for_attraction(document))
+            pending.extend(self._acquire_shared(document))
+        pending.sort()
+        self._keys = [entry[0] for entry in pending]
+        self._entries = pending
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _entries_for_attraction(self, document):
+        entries = []
+        rank = -(document.get("rating") or 0)
+        for key, penalty in _name_keys(document["name"]):
+            entries.append((key, KIND_PRIORITY["attraction"] + penalty, rank, document["name"], "attraction", document["id"]))
+        self._by_attraction[document["id"]] = (entries, self._shared_labels(document))
+        return entries
+
+    @staticmethod
+    def _shared_labels(document):
+        labels = []
+        if document.get("category"):
+            labels.append(("category", document["category"]))
+        labels.extend(("activity", activity) for activity in document.get("activities") or [])
+        return list(dict.fromkeys(labels))
+
+    def _acquire_shared(self, document):
+        entries = []
+        for kind, label in self._shared_labels(document):
+            count = self._shared.get((kind, label), 0)
+            self._shared[(kind, label)] = count + 1
+            if count == 0:
+                key = " ".join(_WORD.findall(fold(label)))
+                entries.append((key, KIND_PRIORITY[kind], 0, label, kind, None))
+        return entries
+
+    def _insert(self, entry):
+        position = bisect_left(self._entries, entry)
+        self._entries.insert(position, entry)
+        self._keys.insert(position, entry[0])
+
+    def _delete(self, entry):
+        position = bisect_left(self._entries, entry)
+        if position < len(self._entries) and self._entries[position] == entry:
+            del self._entries[position]
+            del self._keys[position]
+
+    def remove(self, attraction_id):
+        indexed = self._by_attraction.pop(attraction_id, None)
+        if indexed is None:
+            return
+        entries, shared = indexed
+        for entry in entries:
+            self._delete(entry)
+        for kind, label in shared:
+            count = self._shared.get((kind, label), 0) - 1
+            if count > 0:
+                self._shared[(kind, label)] = count
+                continue
+            self._shared.pop((kind, label), None)
+            key = " ".join(_WORD.findall(fold(label)))
+            self._delete((key, KIND_PRIORITY[kind], 0, label, kind, None))
+
+    def upsert(self, document):
+        """Index an active attraction, replacing its previous entries"""
+        self.remove(document["id"])
+        for entry in self._entries_for_attraction(document) + self._acquire_shared(document):
+            self._insert(entry)
+
+    def suggest(self, prefix, limit=8):
+        """Return ``[{"type", "id", "label"}, ...]`` for keys starting with ``prefix``"""
+        prefix = " ".join(_WORD.findall(fold(prefix)))
+        if not prefix:
+            return []
+
+        start = bisect_left(self._keys, prefix)
+        matches = []
+        for position in range(start, min(start + MAX_SCANNED, len(self._keys))):
+            if not self._keys[position].startswith(prefix):
+                break
+            matches.append(self._entries[position])
+        matches.sort(key=lambda entry: (entry[1], entry[2], entry[3]))
+
+        suggestions = []
+        seen = set()
+        for _, _, _, label, kind, attraction_id in matches:
+            identity = (kind, attraction_id or label)
+            if identity in seen:
+                continue
+            seen.add(identity)
+            suggestions.append({"type": kind, "id": attraction_id, "label": label})
+            if len(suggestions) == limit:
+                break
+        return suggestions
+
+
+def index_write(index, before, after):
+    """Apply one attraction write to ``index`` in place"""
+    if before and before.get("id"):
+        index.remove(before["id"])
+    if after and after.get("is_active", True) and after.get("id"):
+        index.upsert(after)
@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+from pagination import InvalidCursor, decode_cursor, encode_cursor
+import os
+
+# Changes younger than this are held back. updated_at is stamped by the API
+# process before the write commits, so a write can become visible after one
+# with a later timestamp; waiting bounds that window instead of losing it.
+SYNC_LAG_SECONDS = float(os.environ.get("ATTRACTIONS_SYNC_LAG_SECONDS", 5))
+
+_EPOCH = datetime(1970, 1, 1)
+
+# Stored fields clients do not need to rebuild their copy
+_HIDDEN = {"_id": 0, "location": 0}
+
+
+def encode_token(updated_at, attraction_id):
+    return encode_cursor({"t": updated_at.isoformat(), "i": attraction_id})
+
+
+def decode_token(token):
+    payload = decode_cursor(token)
+    try:
+        return datetime.fromisoformat(payload["t"]), str(payload["i"])
+    except (KeyError, TypeError, ValueError):
+        raise InvalidCursor("Malformed sync token")
+
+
+def sync_horizon(now=None):
+    """Latest updated_at a sync may return: at least SYNC_LAG_SECONDS old.
+
+    Rounded down to a multiple of the lag, so every sync within one period
+    reads up to the same instant and identical requests get identical
+    answers (which their ETag relies on).
+    """
+    now = now or datetime.utcnow()
+    lagged = (now - _EPOCH).total_seconds() - SYNC_LAG_SECONDS
+    if SYNC_LAG_SECONDS > 0:
+        lagged -= lagged % SYNC_LAG_SECONDS
+    return _EPOCH + timedelta(seconds=lagged)
+
+
+async def load_changes(db, since=None, limit=500, horizon=None):
+    """Attractions written after the ``since`` token, oldest first.
+
+    Returns ``(documents, next_token, has_more)``. Documents are ordered by
+    (updated_at, id), the position the token records, so paging through a
+    burst of writes neither repeats nor skips any. Without ``since`` every
+    attraction is returned, including soft-deleted ones.
+    """
+    horizon = horizon or sync_horizon()
+    query = {"updated_at": {"$lte": horizon}}
+    if since:
+        updated_at, attraction_id = decode_token(since)
+        query["$or"] = [
+            {"updated_at": {"$gt": updated_at}},
+            {"updated_at": updated_at, "id": {"$gt": attraction_id}},
+        ]
+
+    cursor = db.attractions.find(query, _HIDDEN).sort([("updated_at", 1), ("id", 1)])
+    documents = await cursor.limit(limit + 1).to_list(limit + 1)
+    has_more = len(documents) > limit
+    documents = documents[:limit]
+
+    if documents:
+        last = documents[-1]
+        next_token = encode_token(last["updated_at"], last["id"])
+    else:
+        # Nothing changed up to the horizon, later polls can start there
+        next_token = encode_token(horizon, "")
+    return documents, next_token, has_more
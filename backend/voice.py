@@ -0,0 +1,213 @@
+from collections import defaultdict
+from functools import lru_cache
+from search import STOPWORDS, fold, stem
+import re
+
+_WORD = re.compile(r"\w+")
+
+# Command phrases from docs/VOICE_COMMANDS.md. They are matched after
+# stopword removal, longest first, so "perto de mim" wins over "perto".
+COMMAND_PHRASES = {
+    "navigate": ["navegar", "navega", "ir para", "ir pra", "me leve", "leve me", "como chegar", "rota"],
+    "nearby": ["proximos", "proximo", "perto de mim", "aqui perto", "por perto", "perto"],
+    "home": ["inicio", "voltar", "tela inicial"],
+    "favorites": ["favoritos", "favorito"],
+    "recommended": ["recomendados", "melhores"],
+    "all": ["todos atrativos", "todos os atrativos"],
+    "help": ["ajuda", "comandos"],
+}
+
+# Verbs and fillers that carry no target
+FILLERS = frozenset("abre abrir mostra mostrar mostre ver quero eu me favor gostaria".split())
+
+# Target matches below this score are ignored
+MIN_SCORE = 0.6
+# Minimum trigram similarity for a spoken word to count as a name word
+MIN_WORD_SIMILARITY = 0.5
+
+# Ordered rewrites turning folded Portuguese into a rough sound key, so
+# "Anhumas", "Aniumas" and "Anhumaz" end up the same
+_SOUNDS = [
+    (re.compile(r"ch|sh"), "x"),
+    (re.compile(r"lh"), "li"),
+    (re.compile(r"nh"), "ni"),
+    (re.compile(r"ph"), "f"),
+    (re.compile(r"qu(?=[ei])|gu(?=[ei])"), lambda match: "k" if match.group()[0] == "q" else "g"),
+    (re.compile(r"q"), "k"),
+    (re.compile(r"c(?=[ei])"), "s"),
+    (re.compile(r"c"), "k"),
+    (re.compile(r"z|ss"), "s"),
+    (re.compile(r"(?<=[aeiou])s(?=[aeiou])"), "z"),
+    (re.compile(r"w"), "v"),
+    (re.compile(r"y"), "i"),
+    (re.compile(r"h"), ""),
+    (re.compile(r"m$"), "n"),
+    (re.compile(r"(.)\1+"), r"\1"),
+]
+
+
+@lru_cache(maxsize=65536)
+def sound(word):
+    """Phonetic key of a folded word: "grutas" and "gruttas" -> "grut" """
+    key = stem(word)
+    for pattern, replacement in _SOUNDS:
+        key = pattern.sub(replacement, key)
+    return key or word
+
+
+def _trigrams(key):
+    padded = f"#{key}#"
+    return frozenset(padded[index:index + 3] for index in range(len(padded) - 2))
+
+
+def _similarity(left, right):
+    """Dice coefficient of two trigram sets"""
+    return 2 * len(left & right) / (len(left) + len(right))
+
+
+def _words(text):
+    # "ç" always sounds like "s"; folding alone would turn it into a hard "c"
+    text = text.replace("ç", "s").replace("Ç", "s")
+    return [word for word in _WORD.findall(fold(text)) if word not in STOPWORDS]
+
+
+class VoiceIndex:
+    """Sound-key trigram index over attraction names and categories.
+
+    Every distinct name or category word is stored once with its trigrams;
+    a transcript is resolved by matching its words against that vocabulary
+    and scoring only the targets that share a word with it.
+    """
+
+    def __init__(self, documents):
+        self.targets = []  # (kind, value, label, word count)
+        self._keys = []  # sound key per vocabulary entry
+        self._grams = []  # trigram set per vocabulary entry
+        self._vocabulary = {}  # sound key -> vocabulary entry
+        self._by_gram = defaultdict(list)  # trigram -> vocabulary entries
+        self._by_word = defaultdict(list)  # vocabulary entry -> targets
+
+        categories = {}
+        for document in documents:
+            self._add("attraction", document["id"], document["name"])
+            if document.get("category"):
+                categories.setdefault(document["category"], None)
+        for category in categories:
+            self._add("category", category, category)
+
+        self._phrases = sorted(
+            {(tuple(_words(phrase)), intent)
+             for intent, phrases in COMMAND_PHRASES.items() for phrase in phrases},
+            key=lambda item: len(item[0]),
+            reverse=True,
+        )
+
+    def _add(self, kind, value, label):
+        keys = list(dict.fromkeys(sound(word) for word in _words(label)))
+        if not keys:
+            return
+        target = len(self.targets)
+        self.targets.append((kind, value, label, len(keys)))
+        for key in keys:
+            entry = self._vocabulary.get(key)
+            if entry is None:
+                entry = self._vocabulary[key] = len(self._keys)
+                self._keys.append(key)
+                self._grams.append(_trigrams(key))
+                for gram in self._grams[entry]:
+                    self._by_gram[gram].append(entry)
+            self._by_word[entry].append(target)
+
+    def _commands(self, words):
+        """Split ``words`` into matched command intents and the remaining words"""
+        intents = []
+        remaining = []
+        position = 0
+        while position < len(words):
+            for phrase, intent in self._phrases:
+                if tuple(words[position:position + len(phrase)]) == phrase:
+                    intents.append(intent)
+                    position += len(phrase)
+                    break
+            else:
+                remaining.append(words[position])
+                position += 1
+        return intents, remaining
+
+    def _best_target(self, words):
+        """Return the best ``(score, covered, target)`` or None.
+
+        The score is a Dice coefficient between the spoken words and the
+        target's words, so both unmatched name words and unexplained spoken
+        words lower it.
+        """
+        # Best similarity of each vocabulary entry to any spoken word, and
+        # which spoken word produced it
+        best = {}
+        for spoken, word in enumerate(words):
+            grams = _trigrams(sound(word))
+            candidates = set()
+            for gram in grams:
+                candidates.update(self._by_gram.get(gram, ()))
+            for entry in candidates:
+                similarity = _similarity(grams, self._grams[entry])
+                if similarity >= MIN_WORD_SIMILARITY and similarity > best.get(entry, (0,))[0]:
+                    best[entry] = (similarity, spoken)
+
+        totals = defaultdict(float)
+        covered = defaultdict(set)
+        for entry, (similarity, spoken) in best.items():
+            for target in self._by_word[entry]:
+                totals[target] += similarity
+                covered[target].add(spoken)
+
+        # Ties on score go to the target that explains more of the transcript
+        return min(
+            ((2 * total / (self.targets[target][3] + len(words)), len(covered[target]), target)
+             for target, total in totals.items()),
+            key=lambda match: (-match[0], -match[1], match[2]),
+            default=None,
+        )
+
+    def resolve(self, transcript):
+        """Resolve a raw transcript to ``{"intent", "attraction_id", ...}``"""
+        words = _words(transcript)
+        intents, remaining = self._commands(words)
+        remaining = [word for word in remaining if word not in FILLERS]
+
+        attraction = category = None
+        confidence = 1.0 if intents else 0.0
+        match = self._best_target(remaining)
+        if match is not None and match[0] >= MIN_SCORE:
+            score, _, target = match
+            confidence = score
+            if self.targets[target][0] == "attraction":
+                attraction = target
+            else:
+                category = target
+
+        if "navigate" in intents:
+            intent = "navigate"
+        elif attraction is not None:
+            intent = "open_attraction"
+        elif "nearby" in intents:
+            intent = "nearby"
+        elif category is not None:
+            intent = "category"
+        elif intents:
+            intent = intents[0]
+        else:
+            intent = "unknown"
+
+        result = {
+            "intent": intent,
+            "attraction_id": None,
+            "attraction_name": None,
+            "category": None,
+            "confidence": round(confidence, 3),
+        }
+        if attraction is not None:
+            _, result["attraction_id"], result["attraction_name"], _ = self.targets[attraction]
+        if category is not None:
+            result["category"] = self.targets[category][1]
+        return result
@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Depends
+from models import VoiceCommand, VoiceResolution
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from database import get_database
+from catalog import get_catalog
+
+router = APIRouter(prefix="/api/voice", tags=["voice"])
+
+@router.post("/resolve", response_model=VoiceResolution)
+async def resolve_voice_command(command: VoiceCommand, db: AsyncIOMotorDatabase = Depends(get_database)):
+    """Resolve a speech transcript to an intent and, when named, its attraction or category.
+
+    Attraction names and categories come from the catalog, so new
+    attractions can be addressed by voice without a frontend release.
+    """
+    catalog = await get_catalog(db)
+    return catalog.voice_index.resolve(command.transcript)
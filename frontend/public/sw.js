@@ -30,6 +30,7 @@ self.addEventListener('install', (event) => {
         const cache = await caches.open(STATIC_CACHE);
         console.log('[ServiceWorker] Caching core files');
         await cache.addAll(CORE_FILES);
+        await precacheCatalogBundle();
         
         // Skip waiting to activate immediately
         self.skipWaiting();
@@ -203,6 +204,25 @@ self.addEventListener('sync', (event) => {
   }
 });
 
+// Offline catalog bundle: the file name changes with its content, so a
+// cached copy never needs revalidation and only the manifest is refetched
+async function precacheCatalogBundle() {
+  try {
+    const response = await fetch('/api/attractions/bundle');
+    if (!response.ok) return;
+    
+    const manifest = await response.json();
+    const bundleUrl = `/api/attractions/bundle/${manifest.file}`;
+    const cache = await caches.open(API_CACHE);
+    if (!(await cache.match(bundleUrl))) {
+      await cache.add(bundleUrl);
+      console.log('[ServiceWorker] Catalog bundle cached:', manifest.file);
+    }
+  } catch (error) {
+    console.error('[ServiceWorker] Catalog bundle precache failed:', error);
+  }
+}
+
 async function syncAttractions() {
   try {
     const response = await fetch('/api/attractions');
@@ -0,0 +1,49 @@
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+import httpx
+import pytest
+
+# Backend modules import each other by flat name, as when run from backend/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+# mongomock has no $geoNear
+os.environ.setdefault("ATTRACTIONS_GEO_MODE", "memory")
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def db():
+    """In-process database seeded and indexed the way the API does at startup"""
+    from mongomock_motor import AsyncMongoMockClient
+    import server
+
+    database = AsyncMongoMockClient()["test_database"]
+    await server.startup_event(database)
+    return database
+
+
+@pytest.fixture
+async def client(db):
+    """HTTP client calling the ASGI app in process, with fresh read caches"""
+    from cache import attraction_cache, read_flights
+    import catalog
+    import server
+
+    attraction_cache.clear()
+    attraction_cache.bump_version()
+    read_flights.__init__()
+    catalog._snapshot = None
+    catalog._suggest_index = None
+    # Bound to the event loop of the test that first waited on it
+    catalog._lock = asyncio.Lock()
+
+    server.app.state.db = db
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        yield http
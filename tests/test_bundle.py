@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from bundle import write_bundle
+from sync import SYNC_LAG_SECONDS, decode_token, load_changes, sync_horizon
+
+
+async def stored_attractions(db):
+    return await db.attractions.find({}, {"_id": 0}).to_list(None)
+
+
+@pytest.mark.anyio
+async def test_sync_token_stops_at_the_horizon(db, tmp_path):
+    # Written just now: a write stamped before it may not have committed yet
+    await db.attractions.update_one({"id": "gruta-lago-azul"}, {"$set": {"updated_at": datetime.utcnow()}})
+    late = datetime.utcnow() - timedelta(seconds=SYNC_LAG_SECONDS / 2)
+
+    manifest = write_bundle(await stored_attractions(db), tmp_path)
+    updated_at, attraction_id = decode_token(manifest["sync_token"])
+    assert updated_at <= sync_horizon()
+    assert attraction_id == ""
+
+    # That write commits after the bundle was made; /changes still sends it
+    await db.attractions.update_one({"id": "rio-da-prata"}, {"$set": {"updated_at": late}})
+    documents, _, _ = await load_changes(db, manifest["sync_token"], horizon=datetime.utcnow())
+    assert {"gruta-lago-azul", "rio-da-prata"} <= {document["id"] for document in documents}
+
+
+@pytest.mark.anyio
+async def test_sync_token_of_a_settled_catalog(db, tmp_path):
+    settled = sync_horizon() - timedelta(hours=1)
+    await db.attractions.update_many({}, {"$set": {"updated_at": settled}})
+    attractions = await stored_attractions(db)
+
+    manifest = write_bundle(attractions, tmp_path)
+    assert decode_token(manifest["sync_token"]) == (settled, max(attraction["id"] for attraction in attractions))
+    documents, _, _ = await load_changes(db, manifest["sync_token"])
+    assert documents == []
+
+
+def test_no_sync_token_for_outside_documents(tmp_path):
+    manifest = write_bundle([{"id": "a", "name": "A", "updated_at": datetime.utcnow()}], tmp_path, with_sync_token=False)
+    assert manifest["sync_token"] is None
@@ -0,0 +1,164 @@
+import asyncio
+
+import pytest
+
+from cache import ResponseCache, SingleFlight, attraction_cache, cache_key, encoded_etag, etag_for, matching_etag
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def cache(clock):
+    return ResponseCache(max_entries=2, ttl_seconds=10, clock=clock)
+
+
+@pytest.mark.parametrize("version, stored", [
+    (None, True),
+    (0, True),
+    # Read before a write that landed while loading
+    (-1, False),
+])
+def test_set_skips_stale_bodies(cache, version, stored):
+    entry = cache.set("key", b"body", version=version)
+    assert entry.body == b"body"
+    assert entry.headers["ETag"] == etag_for(b"body")
+    assert (cache.get("key") is not None) == stored
+
+
+def test_set_after_a_write_during_load(cache):
+    version = cache.version
+    cache.bump_version()
+    cache.set("key", b"old", version=version)
+    assert cache.get("key") is None
+
+    cache.set("key", b"new", version=cache.version)
+    assert cache.get("key").body == b"new"
+
+
+@pytest.mark.parametrize("store, max_entries, stored", [
+    (True, 2, True),
+    (False, 2, False),
+    (True, 0, False),
+])
+def test_set_store(clock, store, max_entries, stored):
+    cache = ResponseCache(max_entries=max_entries, ttl_seconds=10, clock=clock)
+    entry = cache.set("key", b"body", etag='"tag"', store=store)
+    assert entry.headers["ETag"] == '"tag"'
+    assert (cache.get("key") is not None) == stored
+
+
+def test_get_misses(cache, clock):
+    cache.set("a", b"a")
+    cache.bump_version()
+    assert cache.get("a") is None
+    assert cache.invalidations == 1
+
+    cache.set("b", b"b")
+    clock.now += 10
+    assert cache.get("b") is None
+    assert cache.expirations == 1
+
+    cache.set("c", b"c")
+    cache.set("d", b"d")
+    cache.get("c")
+    cache.set("e", b"e")
+    # Least recently used goes first
+    assert cache.get("d") is None
+    assert cache.get("c").body == b"c"
+    assert cache.evictions == 1
+
+
+@pytest.mark.parametrize("authoritative, elapsed, same", [
+    (True, 0, True),
+    (True, 3600, True),
+    (False, 0, True),
+    # Outside snapshot mode tags roll over with the TTL
+    (False, 10, False),
+])
+def test_validator(cache, clock, authoritative, elapsed, same):
+    cache.authoritative = authoritative
+    etag = cache.validator("key")
+    clock.now += elapsed
+    assert (cache.validator("key") == etag) == same
+    assert cache.validator("other") != cache.validator("key")
+    assert cache.validator("key", cache.version + 1) != cache.validator("key")
+    assert ResponseCache(clock=clock).validator("key") != cache.validator("key")
+
+
+@pytest.mark.parametrize("if_none_match, etag, matched", [
+    (None, '"a"', None),
+    ("", '"a"', None),
+    ("*", '"a"', '"a"'),
+    ('"a"', '"a"', '"a"'),
+    ('W/"a"', '"a"', 'W/"a"'),
+    ('"b", "a"', '"a"', '"a"'),
+    ('"a-gzip"', '"a"', '"a-gzip"'),
+    ('"a-br"', '"a"', '"a-br"'),
+    ('"a-deflate"', '"a"', None),
+    ('"b"', '"a"', None),
+])
+def test_matching_etag(if_none_match, etag, matched):
+    assert matching_etag(if_none_match, etag) == matched
+
+
+@pytest.mark.parametrize("etag, encoding, encoded", [
+    ('"a"', "gzip", '"a-gzip"'),
+    ('W/"a"', "br", 'W/"a-br"'),
+])
+def test_encoded_etag(etag, encoding, encoded):
+    assert encoded_etag(etag, encoding) == encoded
+
+
+def test_cache_key_ignores_order_and_unset_values():
+    assert cache_key("list", a=1, b=None, c=2) == cache_key("list", c=2, a=1)
+    assert cache_key("list", a=1) != cache_key("stats", a=1)
+
+
+@pytest.mark.anyio
+async def test_single_flight_shares_one_load():
+    flights = SingleFlight()
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    results = await asyncio.gather(*(flights.run("key", load) for _ in range(5)))
+    assert results == [1] * 5
+    assert (flights.flights, flights.coalesced) == (1, 4)
+    # Finished flights are forgotten
+    assert await flights.run("key", load) == 2
+
+
+@pytest.mark.anyio
+async def test_write_during_load_is_not_cached(client, db, monkeypatch):
+    # Collection objects are made on each access, so patch their class
+    collection_class = type(db.attractions)
+    find_one = collection_class.find_one
+
+    def write_while_loading(collection, *args, **kwargs):
+        attraction_cache.bump_version()
+        return find_one(collection, *args, **kwargs)
+
+    monkeypatch.setattr(collection_class, "find_one", write_while_loading)
+    response = await client.get("/api/attractions/gruta-lago-azul")
+
+    assert response.status_code == 200
+    # Served, but a body that may predate the write is not kept
+    assert attraction_cache.get(cache_key("attraction", id="gruta-lago-azul")) is None
+    monkeypatch.undo()
+    await client.get("/api/attractions/gruta-lago-azul")
+    assert attraction_cache.get(cache_key("attraction", id="gruta-lago-azul")) is not None
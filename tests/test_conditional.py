@@ -0,0 +1,115 @@
+import pytest
+
+from cache import attraction_cache, encoded_etag
+
+PATHS = [
+    "/api/attractions/?limit=5",
+    "/api/attractions/gruta-lago-azul",
+    "/api/attractions/stats",
+    "/api/attractions/search?q=gruta",
+    "/api/attractions/suggest?q=gru",
+    "/api/attractions/nearby/-21.1261/-56.4836?limit=3",
+    "/api/attractions/changes",
+]
+
+
+def forbid_reads(monkeypatch, db):
+    """Make every catalog read fail, so a 304 proves nothing was loaded"""
+    import attractions_routes
+
+    def fail(*args, **kwargs):
+        raise AssertionError("read the catalog for a current client")
+
+    for name in ("find_attractions", "get_catalog", "get_suggest_index", "nearby_in_memory", "load_changes"):
+        if hasattr(attractions_routes, name):
+            monkeypatch.setattr(attractions_routes, name, fail)
+    # Collection objects are made on each access, so patch their class
+    collection_class = type(db.attractions)
+    for method in ("find", "find_one", "aggregate", "count_documents"):
+        monkeypatch.setattr(collection_class, method, forbid_on_attractions(getattr(collection_class, method)))
+
+
+def forbid_on_attractions(method):
+    def guarded(collection, *args, **kwargs):
+        if collection.name == "attractions":
+            raise AssertionError("queried attractions for a current client")
+        return method(collection, *args, **kwargs)
+    return guarded
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("path", PATHS)
+async def test_current_tag_is_answered_without_loading(client, db, monkeypatch, path):
+    first = await client.get(path)
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+
+    # Expired, evicted or never built on this worker: the tag still matches
+    attraction_cache.clear()
+    forbid_reads(monkeypatch, db)
+    revalidated = await client.get(path, headers={"If-None-Match": etag})
+
+    assert revalidated.status_code == 304
+    assert revalidated.headers["etag"] == etag
+    assert revalidated.content == b""
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("encoding", ["gzip", "br"])
+async def test_compressed_tag_is_answered_without_loading(client, db, monkeypatch, encoding):
+    etag = (await client.get("/api/attractions/stats")).headers["etag"]
+    held = encoded_etag(etag, encoding)
+
+    forbid_reads(monkeypatch, db)
+    revalidated = await client.get("/api/attractions/stats", headers={"If-None-Match": held})
+
+    assert revalidated.status_code == 304
+    assert revalidated.headers["etag"] == held
+
+
+@pytest.mark.anyio
+async def test_write_changes_the_tag(client):
+    path = "/api/attractions/gruta-lago-azul"
+    etag = (await client.get(path)).headers["etag"]
+
+    updated = await client.put(path, json={"description": "Fechada para manutenção"})
+    assert updated.status_code == 200
+
+    refreshed = await client.get(path, headers={"If-None-Match": etag})
+    assert refreshed.status_code == 200
+    assert refreshed.headers["etag"] != etag
+    assert refreshed.json()["description"] == "Fechada para manutenção"
+
+
+@pytest.mark.anyio
+async def test_tag_follows_the_body(client):
+    path = "/api/attractions/gruta-lago-azul"
+    first = await client.get(path)
+    # Built again after eviction: same body, same tag
+    attraction_cache.clear()
+    second = await client.get(path)
+    assert second.headers["etag"] == first.headers["etag"]
+    assert second.content == first.content
+
+    msgpack = await client.get(path, headers={"Accept": "application/msgpack", "If-None-Match": first.headers["etag"]})
+    assert msgpack.status_code == 200
+
+
+@pytest.mark.anyio
+async def test_favorites_revalidate_against_the_ids(client, db, monkeypatch):
+    path = "/api/attractions/favorites/ana"
+    added = await client.post("/api/attractions/favorites", json={"user_id": "ana", "attraction_id": "gruta-lago-azul"})
+    assert added.status_code == 200
+    etag = (await client.get(path)).headers["etag"]
+
+    added = await client.post("/api/attractions/favorites", json={"user_id": "ana", "attraction_id": "rio-da-prata"})
+    assert added.status_code == 200
+    changed = await client.get(path, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert {attraction["id"] for attraction in changed.json()} == {"gruta-lago-azul", "rio-da-prata"}
+
+    # Same favorites: only the id probe runs
+    forbid_reads(monkeypatch, db)
+    revalidated = await client.get(path, headers={"If-None-Match": changed.headers["etag"]})
+    assert revalidated.status_code == 304
+    assert revalidated.headers["cache-control"] == changed.headers["cache-control"]
@@ -0,0 +1,132 @@
+import pytest
+
+import attractions_routes
+import catalog
+from cache import attraction_cache
+from facets import InvalidFacets, count_in_memory, matches_filter, owned_filters, parse_facets, price_bucket
+
+DOCUMENTS = [
+    {"id": "a", "category": "Gruta", "difficulty": "Fácil", "price_cents": 7500, "rating": 4.5},
+    {"id": "b", "category": "Gruta", "difficulty": "Moderado", "price_cents": 25000, "rating": 4.0},
+    {"id": "c", "category": "Flutuação", "difficulty": "Fácil", "price_cents": None, "rating": 5.0},
+    {"id": "d", "category": "Flutuação", "difficulty": "Fácil", "price_cents": 60000, "rating": None},
+    {"id": "e", "category": None, "difficulty": "Difícil", "price_cents": 0, "rating": 3.5},
+]
+
+
+@pytest.mark.parametrize("facets, requested", [
+    ("category", ("category",)),
+    ("category,price_bucket", ("category", "price_bucket")),
+    (" difficulty , category ", ("difficulty", "category")),
+    ("category,category", ("category",)),
+    ("category,,", ("category",)),
+])
+def test_parse_facets(facets, requested):
+    assert parse_facets(facets) == requested
+
+
+@pytest.mark.parametrize("facets", ["rating", "category,price"])
+def test_parse_unknown_facets(facets):
+    with pytest.raises(InvalidFacets):
+        parse_facets(facets)
+
+
+@pytest.mark.parametrize("price_cents, bucket", [
+    (None, "unknown"),
+    (0, "0-100"),
+    (9999, "0-100"),
+    (10000, "100-200"),
+    (19999, "100-200"),
+    (20000, "200-500"),
+    (50000, "500+"),
+    (-1, "unknown"),
+])
+def test_price_bucket(price_cents, bucket):
+    assert price_bucket(price_cents) == bucket
+
+
+@pytest.mark.parametrize("query, facets, common, owned", [
+    (
+        {"is_active": True, "category": "Gruta"},
+        ("category",),
+        {"is_active": True},
+        {"category": {"category": "Gruta"}},
+    ),
+    (
+        {"is_active": True, "category": "Gruta", "difficulty": "Fácil"},
+        ("difficulty",),
+        {"is_active": True, "category": "Gruta"},
+        {"difficulty": {"difficulty": "Fácil"}},
+    ),
+    (
+        {"is_active": True, "price_cents": {"$lte": 10000}, "rating": {"$gte": 4}},
+        ("category", "price_bucket"),
+        {"is_active": True, "rating": {"$gte": 4}},
+        {"category": {}, "price_bucket": {"price_cents": {"$lte": 10000}}},
+    ),
+    ({"is_active": True}, (), {"is_active": True}, {}),
+])
+def test_owned_filters(query, facets, common, owned):
+    original = dict(query)
+    assert owned_filters(query, facets) == (common, owned)
+    # The query itself is left alone
+    assert query == original
+
+
+@pytest.mark.parametrize("query, facets, counts", [
+    (
+        {},
+        ("category", "difficulty", "price_bucket"),
+        {
+            "category": {"Flutuação": 2, "Gruta": 2},
+            "difficulty": {"Fácil": 3, "Difícil": 1, "Moderado": 1},
+            "price_bucket": {"0-100": 2, "200-500": 1, "500+": 1, "unknown": 1},
+        },
+    ),
+    (
+        # Each facet ignores its own filter but applies the others
+        {"category": "Gruta", "difficulty": "Fácil"},
+        ("category", "difficulty"),
+        {"category": {"Flutuação": 2, "Gruta": 1}, "difficulty": {"Fácil": 1, "Moderado": 1}},
+    ),
+    (
+        # Filters without a facet narrow every count
+        {"rating": {"$gte": 4}, "category": "Gruta"},
+        ("category", "price_bucket"),
+        {"category": {"Gruta": 2, "Flutuação": 1}, "price_bucket": {"0-100": 1, "200-500": 1}},
+    ),
+    (
+        {"price_cents": {"$lte": 10000}},
+        ("price_bucket", "difficulty"),
+        {"price_bucket": {"0-100": 2, "200-500": 1, "500+": 1, "unknown": 1}, "difficulty": {"Difícil": 1, "Fácil": 1}},
+    ),
+])
+def test_count_in_memory(query, facets, counts):
+    common, owned = owned_filters(query, facets)
+    matching = [document for document in DOCUMENTS if matches_filter(document, common)]
+    result = count_in_memory(matching, owned)
+    assert result == counts
+    # Largest counts first
+    for values in result.values():
+        assert list(values.values()) == sorted(values.values(), reverse=True)
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("params", [
+    {"facets": "category,difficulty,price_bucket"},
+    {"facets": "category,price_bucket", "category": "Gruta"},
+    {"facets": "difficulty", "category": "Gruta", "difficulty": "Fácil"},
+    {"facets": "price_bucket", "price_max": 100, "rating_min": 4},
+])
+async def test_facets_agree_across_read_modes(client, monkeypatch, params):
+    responses = []
+    for mode in ("mongo", "snapshot"):
+        monkeypatch.setattr(attractions_routes, "READ_MODE", mode)
+        monkeypatch.setattr(catalog, "READ_MODE", mode)
+        attraction_cache.clear()
+        response = await client.get("/api/attractions/", params={**params, "include_total": True, "limit": 100})
+        assert response.status_code == 200
+        responses.append(response)
+    mongo, snapshot = responses
+    assert mongo.json()["facets"] == snapshot.json()["facets"]
+    assert mongo.headers["x-total-count"] == snapshot.headers["x-total-count"]
@@ -0,0 +1,43 @@
+import asyncio
+
+import pytest
+
+from indexes import ensure_indexes
+
+pytestmark = pytest.mark.anyio
+
+ATTEMPTS = 20
+
+
+async def test_concurrent_adds_store_one_favorite(client, db):
+    report = await ensure_indexes(db)
+    assert "favorites.user_attraction_unique" in report["created"] + report["unchanged"]
+
+    favorite = {"user_id": "concurrency", "attraction_id": "gruta-lago-azul"}
+    responses = await asyncio.gather(*(
+        client.post("/api/attractions/favorites", json=favorite) for _ in range(ATTEMPTS)
+    ))
+
+    status_codes = sorted(response.status_code for response in responses)
+    assert status_codes == [200] + [400] * (ATTEMPTS - 1)
+    assert await db.favorites.count_documents(favorite) == 1
+
+    listed = await client.get("/api/attractions/favorites/concurrency", params={"view": "card"})
+    assert [attraction["id"] for attraction in listed.json()] == ["gruta-lago-azul"]
+
+
+async def test_duplicates_are_removed_before_building_the_index(db):
+    await db.favorites.drop_indexes()
+    duplicate = {"user_id": "u", "attraction_id": "rio-da-prata"}
+    await db.favorites.insert_many([dict(duplicate) for _ in range(3)])
+
+    report = await ensure_indexes(db)
+
+    assert report["deduplicated"] == [{"index": "favorites.user_attraction_unique", "removed": 2}]
+    assert report["failed"] == []
+    assert await db.favorites.count_documents(duplicate) == 1
+
+
+async def test_unknown_attraction_is_rejected(client):
+    response = await client.post("/api/attractions/favorites", json={"user_id": "u", "attraction_id": "nope"})
+    assert response.status_code == 404
@@ -0,0 +1,50 @@
+import pytest
+
+from normalization import parse_distance_km, parse_duration_minutes, parse_price_cents
+
+
+@pytest.mark.parametrize("price, cents", [
+    ("R$ 75,00", 7500),
+    ("R$ 75", 7500),
+    ("R$ 75,5", 7550),
+    ("R$ 1.250,50", 125050),
+    ("R$1.250", 125000),
+    ("75.50", 7550),
+    ("2 x R$ 50,00", 5000),
+    ("A partir de R$ 120,00 por pessoa", 12000),
+    ("Grátis", 0),
+    ("Entrada gratuita", 0),
+    ("Consulte", None),
+    ("", None),
+    (None, None),
+])
+def test_parse_price_cents(price, cents):
+    assert parse_price_cents(price) == cents
+
+
+@pytest.mark.parametrize("duration, minutes", [
+    ("1h 30min", 90),
+    ("1h30", 90),
+    ("45 min", 45),
+    ("2 horas", 120),
+    ("1,5 h", 90),
+    ("3h", 180),
+    ("Dia inteiro", None),
+    ("", None),
+    (None, None),
+])
+def test_parse_duration_minutes(duration, minutes):
+    assert parse_duration_minutes(duration) == minutes
+
+
+@pytest.mark.parametrize("distance, km", [
+    ("20 km", 20),
+    ("1,5 km", 1.5),
+    ("800 m", 0.8),
+    ("12 quilômetros", 12),
+    ("Centro de Bonito", None),
+    ("", None),
+    (None, None),
+])
+def test_parse_distance_km(distance, km):
+    assert parse_distance_km(distance) == (None if km is None else pytest.approx(km))
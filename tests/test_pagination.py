@@ -0,0 +1,194 @@
+from itertools import islice
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+import attractions_routes
+import catalog
+from cache import attraction_cache
+from catalog import CatalogSnapshot
+from pagination import (
+    SORTS,
+    InvalidCursor,
+    cursor_offset,
+    encode_cursor,
+    keyset_cursor,
+    keyset_filter,
+    offset_cursor,
+    sort_spec,
+)
+
+# Ties on every sort field and nulls where normalization found no number
+CATALOG = [
+    {"id": "a", "name": "Gruta", "rating": 4.5, "price_cents": 7500},
+    {"id": "b", "name": "Boia", "rating": None, "price_cents": None},
+    {"id": "c", "name": "Aquario", "rating": 4.5, "price_cents": None},
+    {"id": "d", "name": "Gruta", "rating": 3.0, "price_cents": 0},
+    {"id": "e", "name": "Cachoeira", "rating": None, "price_cents": 7500},
+    {"id": "f", "name": "Mergulho", "rating": 5.0, "price_cents": 32000},
+    {"id": "g", "name": "Boia", "rating": 3.0, "price_cents": None},
+    {"id": "h", "name": "Trilha", "rating": 4.8, "price_cents": 0},
+]
+
+# Ids in each sort order: rating descending with nulls last, name and price
+# ascending with nulls first, ties broken by id
+EXPECTED = {
+    "rating": ["f", "h", "a", "c", "d", "g", "b", "e"],
+    "name": ["c", "b", "g", "e", "a", "d", "f", "h"],
+    "price": ["b", "c", "g", "d", "h", "a", "e", "f"],
+}
+
+
+def documents():
+    return [{**document, "is_active": True} for document in CATALOG]
+
+
+async def mongo_collection():
+    collection = AsyncMongoMockClient()["pagination"]["attractions"]
+    await collection.insert_many(documents())
+    return collection
+
+
+async def mongo_page(collection, sort, cursor, limit):
+    query = {"is_active": True}
+    if cursor:
+        query = {**query, **keyset_filter(sort, cursor)}
+    return await collection.find(query, {"_id": 0}).sort(sort_spec(sort)).limit(limit).to_list(limit)
+
+
+async def snapshot_page(snapshot, sort, cursor, limit):
+    return list(islice(snapshot.select({"is_active": True}, sort, cursor), limit))
+
+
+async def page_through(pages, sort, limit):
+    """Ids of every page, fetching page i with ``pages[i % len(pages)]``"""
+    ids, cursor = [], None
+    for number in range(len(CATALOG) + 1):
+        page = await pages[number % len(pages)](sort, cursor, limit)
+        ids.extend(document["id"] for document in page)
+        if len(page) < limit:
+            return ids
+        cursor = keyset_cursor(sort, page[-1])
+    raise AssertionError("pagination did not end")
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("sort", SORTS)
+@pytest.mark.parametrize("limit", [1, 2, 3, 8])
+@pytest.mark.parametrize("modes", [
+    ("mongo",),
+    ("snapshot",),
+    # A cursor from one mode continues in the other
+    ("mongo", "snapshot"),
+    ("snapshot", "mongo"),
+])
+async def test_pages_have_no_overlap_or_gaps(sort, limit, modes):
+    collection = await mongo_collection()
+    snapshot = CatalogSnapshot(0, documents())
+    fetchers = {
+        "mongo": lambda sort, cursor, limit: mongo_page(collection, sort, cursor, limit),
+        "snapshot": lambda sort, cursor, limit: snapshot_page(snapshot, sort, cursor, limit),
+    }
+    ids = await page_through([fetchers[mode] for mode in modes], sort, limit)
+    assert ids == EXPECTED[sort]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("sort", SORTS)
+async def test_listing_pages_across_read_modes(client, db, monkeypatch, sort):
+    await db.attractions.insert_many(documents())
+    expected = (await client.get(f"/api/attractions/?sort={sort}&limit=100&fields=id")).json()
+
+    ids, cursor = [], None
+    for number in range(len(expected) + 1):
+        # Alternate modes page by page, each page built afresh
+        mode = ("mongo", "snapshot")[number % 2]
+        monkeypatch.setattr(attractions_routes, "READ_MODE", mode)
+        monkeypatch.setattr(catalog, "READ_MODE", mode)
+        attraction_cache.clear()
+        response = await client.get(
+            "/api/attractions/", params={"sort": sort, "limit": 3, "fields": "id", **({"cursor": cursor} if cursor else {})},
+        )
+        assert response.status_code == 200
+        ids.extend(attraction["id"] for attraction in response.json())
+        cursor = response.headers.get("x-next-cursor")
+        if cursor is None:
+            break
+    assert ids == [attraction["id"] for attraction in expected]
+
+
+@pytest.mark.parametrize("sort, token", [
+    ("rating", "not a cursor!"),
+    ("rating", "e30"),  # {} in base64
+    ("rating", encode_cursor([4.5, "a"])),
+    ("rating", encode_cursor({"s": "rating"})),
+    ("rating", encode_cursor({"s": "rating", "k": [4.5]})),
+    ("rating", encode_cursor({"s": "rating", "k": "a"})),
+    ("rating", encode_cursor({"s": "name", "k": ["Gruta", "a"]})),
+    ("price", encode_cursor({"s": "rating", "k": [4.5, "a"]})),
+    ("name", offset_cursor("name", 3)),
+    ("rating", offset_cursor("relevance", 3)),
+])
+def test_bad_or_mismatched_cursor(sort, token):
+    with pytest.raises(InvalidCursor):
+        keyset_filter(sort, token)
+    with pytest.raises(InvalidCursor):
+        list(CatalogSnapshot(0, documents()).select({"is_active": True}, sort, token))
+
+
+@pytest.mark.parametrize("sort, token", [
+    # Value of another type than the field: Mongo just compares by type
+    ("rating", encode_cursor({"s": "rating", "k": ["4.5", "a"]})),
+    ("price", encode_cursor({"s": "price", "k": ["7500", "a"]})),
+])
+def test_cursor_of_the_wrong_type_in_the_snapshot(sort, token):
+    with pytest.raises(InvalidCursor):
+        list(CatalogSnapshot(0, documents()).select({"is_active": True}, sort, token))
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("params", [
+    {"cursor": "not a cursor!"},
+    {"cursor": offset_cursor("relevance", 1)},
+    {"sort": "price", "cursor": keyset_cursor("rating", {"id": "a", "rating": 4.5})},
+    {"search": "gruta", "cursor": keyset_cursor("rating", {"id": "a", "rating": 4.5})},
+])
+async def test_listing_rejects_bad_cursor(client, params):
+    response = await client.get("/api/attractions/", params=params)
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("sort, offset", [("relevance", 0), ("relevance", 20), ("rating", 7)])
+def test_offset_cursor_round_trip(sort, offset):
+    assert cursor_offset(sort, offset_cursor(sort, offset)) == offset
+
+
+@pytest.mark.parametrize("sort, token", [
+    ("relevance", offset_cursor("rating", 3)),
+    ("relevance", encode_cursor({"s": "relevance", "o": -1})),
+    ("relevance", encode_cursor({"s": "relevance", "o": "3"})),
+    ("relevance", encode_cursor({"s": "relevance"})),
+    ("relevance", keyset_cursor("rating", {"id": "a", "rating": 4.5})),
+    ("relevance", "not a cursor!"),
+])
+def test_bad_offset_cursor(sort, token):
+    with pytest.raises(InvalidCursor):
+        cursor_offset(sort, token)
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("limit", [1, 2, 5])
+async def test_search_pages_by_offset(client, limit):
+    everything = (await client.get("/api/attractions/", params={"search": "agua", "limit": 100, "fields": "id"})).json()
+    assert len(everything) > 2
+
+    ids, cursor = [], None
+    while True:
+        params = {"search": "agua", "limit": limit, "fields": "id", **({"cursor": cursor} if cursor else {})}
+        response = await client.get("/api/attractions/", params=params)
+        ids.extend(attraction["id"] for attraction in response.json())
+        cursor = response.headers.get("x-next-cursor")
+        if cursor is None:
+            break
+        assert cursor_offset("relevance", cursor) == len(ids)
+    assert ids == [attraction["id"] for attraction in everything]
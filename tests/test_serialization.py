@@ -0,0 +1,60 @@
+import msgpack
+import pytest
+
+from serialization import JSON, MSGPACK, negotiate
+
+
+@pytest.mark.parametrize("accept, media_type", [
+    (None, JSON),
+    ("", JSON),
+    ("application/json", JSON),
+    ("*/*", JSON),
+    ("application/*", JSON),
+    ("application/msgpack", MSGPACK),
+    ("application/x-msgpack", MSGPACK),
+    ("Application/MsgPack", MSGPACK),
+    ("application/json, application/msgpack", MSGPACK),
+    ("application/msgpack;q=0.5, application/json", JSON),
+    ("application/json;q=0.5, application/msgpack", MSGPACK),
+    ("application/x-msgpack;q=0.9, */*;q=0.1", MSGPACK),
+    ("application/msgpack;q=0.5, */*", JSON),
+    ("application/msgpack;q=0", JSON),
+    ("application/msgpack;q=oops", JSON),
+    ("text/html, application/msgpack;q=0.8", MSGPACK),
+])
+def test_negotiate(accept, media_type):
+    assert negotiate(accept) == media_type
+
+
+PATHS = [
+    "/api/attractions/?limit=5",
+    "/api/attractions/?view=card&limit=5",
+    "/api/attractions/?facets=category,price_bucket&limit=2",
+    "/api/attractions/gruta-lago-azul",
+    "/api/attractions/stats",
+    "/api/attractions/categories",
+    "/api/attractions/batch?ids=rio-da-prata,nope",
+    "/api/attractions/search?q=gruta",
+    "/api/attractions/nearby/-21.1261/-56.4836?limit=3",
+]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("path", PATHS)
+@pytest.mark.parametrize("accept", ["application/msgpack", "application/x-msgpack"])
+async def test_msgpack_body_decodes_equal_to_json(client, path, accept):
+    json_response = await client.get(path)
+    msgpack_response = await client.get(path, headers={"Accept": accept})
+
+    assert json_response.status_code == msgpack_response.status_code == 200
+    assert json_response.headers["content-type"].startswith(JSON)
+    assert msgpack_response.headers["content-type"].startswith(MSGPACK)
+    assert msgpack.unpackb(msgpack_response.content) == json_response.json()
+    # Cached separately per format, so each format keeps its own validator
+    assert msgpack_response.headers["etag"] != json_response.headers["etag"]
+
+
+@pytest.mark.anyio
+async def test_json_stays_the_default(client):
+    response = await client.get("/api/attractions/stats", headers={"Accept": "*/*"})
+    assert response.headers["content-type"].startswith(JSON)
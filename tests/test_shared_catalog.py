@@ -0,0 +1,151 @@
+from datetime import datetime
+
+import pytest
+
+import catalog
+from catalog import CatalogSnapshot
+from data.initial_attractions import get_initial_attractions
+from geo import to_geojson_point
+from normalization import normalized_fields
+from pagination import SORTS
+from search import SearchIndex
+from shared_catalog import SharedCatalog
+
+
+def stored_documents():
+    """Attractions as the snapshot loads them, plus one without category or coordinates"""
+    documents = []
+    for document in get_initial_attractions():
+        document.update(normalized_fields(document))
+        document["location"] = to_geojson_point(document["coordinates"])
+        documents.append(document)
+    documents.append({
+        "id": "sem-categoria",
+        "name": "Passeio sem categoria",
+        "rating": None,
+        "price_cents": None,
+        "created_at": datetime(2024, 1, 2, 3, 4, 5, 678000),
+        "updated_at": datetime(2024, 1, 2, 3, 4, 5, 678000),
+    })
+    return documents
+
+
+@pytest.fixture
+def documents():
+    return stored_documents()
+
+
+@pytest.fixture
+def published(tmp_path, documents):
+    shared = SharedCatalog(tmp_path)
+    marker = (datetime(2024, 5, 6, 7, 8, 9), "rio-da-prata")
+    shared.publish(CatalogSnapshot(0, documents, marker))
+    generation, loaded_marker, views = shared.load()
+    return shared, generation, loaded_marker, CatalogSnapshot(generation, None, loaded_marker, views)
+
+
+def test_load_before_publish(tmp_path):
+    shared = SharedCatalog(tmp_path)
+    assert shared.generation() == 0
+    assert shared.load() is None
+
+
+def test_round_trip_documents(published, documents):
+    shared, generation, marker, snapshot = published
+    assert generation == shared.generation() == 1
+    assert marker == (datetime(2024, 5, 6, 7, 8, 9), "rio-da-prata")
+    assert len(snapshot.documents) == len(documents)
+    assert list(snapshot.documents) == documents
+    assert snapshot.documents[-1] == documents[-1]
+    assert snapshot.documents[1:3] == documents[1:3]
+    assert isinstance(snapshot.documents[0]["created_at"], datetime)
+    with pytest.raises(IndexError):
+        snapshot.documents[len(documents)]
+
+
+def test_round_trip_lookups(published, documents):
+    _, _, _, snapshot = published
+    private = CatalogSnapshot(0, documents)
+
+    for document in documents:
+        assert snapshot.by_id[document["id"]] == document
+        assert document["id"] in snapshot.by_id
+    assert sorted(snapshot.by_id) == sorted(private.by_id)
+    assert "nope" not in snapshot.by_id
+    assert snapshot.by_id.get("nope") is None
+    assert 3 not in snapshot.by_id
+    with pytest.raises(KeyError):
+        snapshot.by_id["nope"]
+
+    assert dict(snapshot.by_category) == private.by_category
+    assert dict(snapshot.by_difficulty) == private.by_difficulty
+    assert None in snapshot.by_category
+
+
+def test_round_trip_arrays(published, documents):
+    _, _, _, snapshot = published
+    private = CatalogSnapshot(0, documents)
+
+    assert snapshot.positions.tolist() == private.positions.tolist()
+    assert snapshot.lat.tolist() == private.lat.tolist()
+    assert snapshot.lon.tolist() == private.lon.tolist()
+    for sort in SORTS:
+        assert snapshot.order(sort).tolist() == private.order(sort).tolist()
+        assert [document["id"] for document in snapshot.select({}, sort)] == \
+            [document["id"] for document in private.select({}, sort)]
+
+
+@pytest.mark.parametrize("query", ["gruta", "Cachoeíra", "rio azul", "flutua", "mergulho", "ab", "zzz"])
+def test_search_from_arrays_matches_built_index(published, documents, query):
+    _, _, _, snapshot = published
+    built = SearchIndex(documents)
+    mapped = snapshot.search_index
+
+    assert mapped.search(query) == built.search(query)
+    assert mapped.search(query, 2) == built.search(query, 2)
+    for position in range(len(documents)):
+        assert mapped.snippet(position, query) == built.snippet(position, query)
+
+
+def test_from_arrays_with_plain_arrays(documents):
+    built = SearchIndex(documents)
+    rebuilt = SearchIndex.from_arrays(
+        documents, list(built.terms), built.offsets, built.positions, built.weights, built.idf, built.norms,
+    )
+    assert rebuilt.search("gruta lago") == built.search("gruta lago")
+
+
+@pytest.mark.anyio
+async def test_adopt_generation_published_by_another_worker(tmp_path, monkeypatch, documents):
+    monkeypatch.setattr(catalog, "shared_catalog", SharedCatalog(tmp_path))
+    monkeypatch.setattr(catalog, "READ_MODE", "snapshot")
+    monkeypatch.setattr(catalog, "_snapshot", None)
+    assert catalog._adopt() is False
+
+    other = SharedCatalog(tmp_path)
+    generation = other.publish(CatalogSnapshot(0, documents))
+    assert catalog._adopt() is True
+    adopted = catalog._snapshot
+    assert adopted.version == generation
+    assert catalog.attraction_cache.version == generation
+    assert adopted.is_fresh()
+    # No database: a fresh mapped snapshot is served as it is
+    assert await catalog.get_catalog(None) is adopted
+
+    later = other.publish(CatalogSnapshot(0, documents[:2]))
+    assert not adopted.is_fresh()
+    current = await catalog.get_catalog(None)
+    assert current.version == later
+    assert [document["id"] for document in current.documents] == [document["id"] for document in documents[:2]]
+
+
+def test_workers_share_the_catalog_name(tmp_path, monkeypatch, documents):
+    first, second = SharedCatalog(tmp_path), SharedCatalog(tmp_path)
+    assert first.token == second.token
+    assert SharedCatalog(tmp_path / "other").token != first.token
+
+    monkeypatch.setattr(catalog, "shared_catalog", first)
+    monkeypatch.setattr(catalog, "READ_MODE", "snapshot")
+    # Validators follow a generation this worker has not mapped yet
+    generation = second.publish(CatalogSnapshot(0, documents))
+    assert catalog.catalog_version() == generation